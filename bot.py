@@ -1,15 +1,27 @@
+import asyncio
 import database as db
+import deletion_queue
 import discord
 import os
 import logging
+import math
+import metrics
+import outbound
+import registration
+import secrets
+import sorteio
+import time
 import utils
+from collections import OrderedDict
 from datetime import datetime
 from discord import app_commands
 from discord.ext import commands
-from threading import Thread
-from flask import Flask, jsonify
+from aiohttp import web
 from dotenv import load_dotenv
 
+# tempo gasto em db.* entra nas métricas do handler que fez a chamada
+metrics.instrument_module(db)
+
 # COLOQUE AS FUNÇÕES AQUI:
 def is_admin_or_moderator(interaction: discord.Interaction) -> bool:
     """Verifica se o usuário é admin ou moderador do bot"""
@@ -25,32 +37,48 @@ def admin_or_mod_check():
         return True
     return app_commands.check(predicate)
 
-app = Flask(__name__)
+# servidor HTTP de keepalive/health/métricas; roda no mesmo event loop do bot
+routes = web.RouteTableDef()
 
-@app.route('/')
-def home():
-    return "✅ Bot Discord está online e rodando!", 200
+@routes.get('/')
+async def home(request: web.Request) -> web.Response:
+    return web.Response(text="✅ Bot Discord está online e rodando!")
 
-@app.route('/health')
-def health():
-    # tenta pegar objeto do bot (suporta tanto 'bot' quanto 'client')
-    bot_obj = None
-    for name in ('bot', 'client'):
-        obj = globals().get(name)
-        if obj:
-            bot_obj = obj
-            break
-    bot_name = "connecting"
-    try:
-        if bot_obj and getattr(bot_obj, "user", None):
-            bot_name = bot_obj.user.name
-    except Exception:
-        bot_name = "connecting"
-    return jsonify({"status": "healthy", "bot": bot_name}), 200
+def is_gateway_connected() -> bool:
+    # latência vira inf/nan enquanto não há heartbeat com o gateway
+    return bot.is_ready() and not bot.is_closed() and math.isfinite(bot.latency)
+
+@routes.get('/health')
+async def health(request: web.Request) -> web.Response:
+    # pronto = gateway conectado e banco carregado; senão 503 para o monitor
+    gateway = is_gateway_connected()
+    database = db.is_loaded()
+    ready = gateway and database
+    return web.json_response({
+        "status": "healthy" if ready else "starting",
+        "bot": bot.user.name if bot.user else "connecting",
+        "gateway": gateway,
+        "database": database,
+        "latency_ms": round(bot.latency * 1000) if gateway else None
+    }, status=200 if ready else 503)
+
+@routes.get('/metrics')
+async def metrics_endpoint(request: web.Request) -> web.Response:
+    # devolve o último snapshot publicado; não renderiza nada por requisição
+    return web.Response(
+        text=metrics.snapshot(),
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+    )
 
-def run_flask():
+async def start_web_server() -> web.AppRunner:
+    app = web.Application()
+    app.add_routes(routes)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
     port = int(os.getenv("PORT", 5000))
-    app.run(host="0.0.0.0", port=port, debug=False)
+    await web.TCPSite(runner, host="0.0.0.0", port=port).start()
+    logging.info(f"Servidor HTTP iniciado na porta {port}")
+    return runner
 
 load_dotenv()
 
@@ -62,7 +90,28 @@ intents.members = True
 intents.message_content = True
 intents.guilds = True
 
-bot = commands.Bot(command_prefix="!", intents=intents)
+class SorteioBot(commands.Bot):
+    web_runner: Optional[web.AppRunner] = None
+
+    async def setup_hook(self):
+        self.web_runner = await start_web_server()
+        registrations.start()
+        reaction_stamper.start()
+        self.loop.create_task(metrics.monitor_loop_lag(), name="loop-lag-monitor")
+        self.loop.create_task(publish_metrics(), name="metrics-publisher")
+    
+    async def close(self):
+        # grava o journal/snapshot pela thread de I/O do banco antes de desconectar
+        try:
+            await db.flush_async(compact=True)
+        except Exception as e:
+            logging.error(f"Erro ao gravar database no encerramento: {e}")
+        if self.web_runner is not None:
+            await self.web_runner.cleanup()
+        await super().close()
+
+bot = SorteioBot(command_prefix="!", intents=intents)
+metrics.instrument_http(bot.http)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -70,6 +119,42 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# todas as chamadas REST de saída (exceto a resposta inicial da interação) passam por aqui
+outbound_scheduler = outbound.OutboundScheduler()
+
+async def followup_send(interaction: discord.Interaction, *args, **kwargs):
+    return await outbound_scheduler.submit(
+        ("interaction", interaction.token), outbound.PRIORITY_ACK,
+        lambda: interaction.followup.send(*args, **kwargs)
+    )
+
+async def channel_send(channel, *args, priority: int = outbound.PRIORITY_ANNOUNCEMENT, **kwargs):
+    return await outbound_scheduler.submit(
+        ("send", channel.id), priority,
+        lambda: channel.send(*args, **kwargs)
+    )
+
+async def message_edit(message, priority: int = outbound.PRIORITY_BULK, **kwargs):
+    # edições pendentes da mesma mensagem são fundidas; vale a mais recente
+    return await outbound_scheduler.submit(
+        ("edit", message.channel.id), priority,
+        lambda: message.edit(**kwargs),
+        coalesce_key=("edit", message.id)
+    )
+
+async def message_delete(message, priority: int = outbound.PRIORITY_BULK):
+    return await outbound_scheduler.submit(
+        ("delete", message.channel.id), priority,
+        lambda: message.delete()
+    )
+
+async def add_reaction(message, emoji, priority: int = outbound.PRIORITY_REACTION):
+    return await outbound_scheduler.submit(
+        ("reaction", message.channel.id), priority,
+        lambda: message.add_reaction(emoji),
+        coalesce_key=("reaction", message.id, str(emoji))
+    )
+
 class InscricaoModal(discord.ui.Modal, title="Inscrição no Sorteio"):
     primeiro_nome = discord.ui.TextInput(
         label="Primeiro Nome",
@@ -92,12 +177,14 @@ class InscricaoModal(discord.ui.Modal, title="Inscrição no Sorteio"):
         max_length=100
     )
     
+    @metrics.profiled("modal:inscricao")
     async def on_submit(self, interaction: discord.Interaction):
         try:
             await interaction.response.defer(ephemeral=True)
             
             if db.is_blacklisted(interaction.user.id):
-                await interaction.followup.send(
+                await followup_send(
+                    interaction,
                     "❌ Você está na blacklist e não pode se inscrever.",
                     ephemeral=True
                 )
@@ -109,11 +196,12 @@ class InscricaoModal(discord.ui.Modal, title="Inscrição no Sorteio"):
             
             valid, error_msg = utils.validate_full_name(first_name, last_name)
             if not valid:
-                await interaction.followup.send(error_msg, ephemeral=True)
+                await followup_send(interaction, error_msg, ephemeral=True)
                 return
             
             if db.is_name_taken(first_name, last_name):
-                await interaction.followup.send(
+                await followup_send(
+                    interaction,
                     "❌ Este nome já foi registrado por outro participante.",
                     ephemeral=True
                 )
@@ -121,14 +209,16 @@ class InscricaoModal(discord.ui.Modal, title="Inscrição no Sorteio"):
             
             required_hashtag = db.get_hashtag()
             if not required_hashtag:
-                await interaction.followup.send(
+                await followup_send(
+                    interaction,
                     "⚠️ Nenhuma hashtag foi configurada ainda. Contate um administrador.",
                     ephemeral=True
                 )
                 return
             
             if hashtag_input.lower() != required_hashtag.lower():
-                await interaction.followup.send(
+                await followup_send(
+                    interaction,
                     f"❌ Hashtag incorreta! A hashtag correta é: `{required_hashtag}`",
                     ephemeral=True
                 )
@@ -136,7 +226,8 @@ class InscricaoModal(discord.ui.Modal, title="Inscrição no Sorteio"):
             
             inscricao_channel_id = db.get_inscricao_channel()
             if not inscricao_channel_id:
-                await interaction.followup.send(
+                await followup_send(
+                    interaction,
                     "⚠️ Canal de inscrições não configurado. Contate um administrador.",
                     ephemeral=True
                 )
@@ -144,54 +235,178 @@ class InscricaoModal(discord.ui.Modal, title="Inscrição no Sorteio"):
             
             inscricao_channel = interaction.guild.get_channel(inscricao_channel_id)
             if not inscricao_channel:
-                await interaction.followup.send(
+                await followup_send(
+                    interaction,
                     "⚠️ Canal de inscrições não encontrado. Contate um administrador.",
                     ephemeral=True
                 )
                 return
             
-            bonus_roles = db.get_bonus_roles()
-            tag_config = db.get_tag()
-            
-            member = interaction.user
-            if isinstance(member, discord.User):
-                member = interaction.guild.get_member(interaction.user.id)
-            
-            tickets = utils.calculate_tickets(
-                member,
-                bonus_roles,
-                tag_config["enabled"],
-                tag_config["text"],
-                tag_config["quantity"]
-            )
-            
-            total_tickets = utils.get_total_tickets(tickets)
-            
-            msg_content = f"{member.mention}\n{first_name} {last_name}\n{required_hashtag}"
+            if db.is_registered(interaction.user.id):
+                await followup_send(
+                    interaction,
+                    "❌ Você já está inscrito no sorteio!",
+                    ephemeral=True
+                )
+                return
             
-            msg = await inscricao_channel.send(msg_content)
-            await msg.add_reaction("✅")  # Adiciona reação de verificado
+            if registrations.is_pending(interaction.user.id):
+                await followup_send(
+                    interaction,
+                    "⏳ Sua inscrição já está na fila. Aguarde a confirmação.",
+                    ephemeral=True
+                )
+                return
             
-            db.add_participant(
-                interaction.user.id,
-                first_name,
-                last_name,
-                tickets,
-                msg.id
-            )
+            acknowledged = asyncio.Event()
+            position = registrations.submit({
+                "interaction": interaction,
+                "acknowledged": acknowledged,
+                "user_id": interaction.user.id,
+                "first_name": first_name,
+                "last_name": last_name,
+                "hashtag": required_hashtag,
+                "channel_id": inscricao_channel_id
+            })
+            if position is None:
+                await followup_send(
+                    interaction,
+                    "⚠️ Muitas inscrições no momento. Tente novamente em instantes.",
+                    ephemeral=True
+                )
+                return
             
-            logger.info(f"Nova inscrição: {first_name} {last_name} ({interaction.user.id}) - {total_tickets} fichas")
+            try:
+                await followup_send(
+                    interaction,
+                    f"⏳ Inscrição recebida! Posição na fila: {position}.\n"
+                    "Você receberá a confirmação aqui assim que ela for processada.",
+                    ephemeral=True
+                )
+            finally:
+                acknowledged.set()
             
         except Exception as e:
             logger.error(f"Erro no modal de inscrição: {e}", exc_info=True)
             try:
-                await interaction.followup.send(
+                await followup_send(
+                    interaction,
                     "❌ Ocorreu um erro ao processar sua inscrição. Tente novamente.",
                     ephemeral=True
                 )
             except:
                 pass
 
+async def _process_registration(job: dict):
+    """
+    Worker da fila de inscrições: reserva o participante no banco, posta no
+    canal de inscrições e confirma para o usuário. Os passos concluídos ficam
+    marcados no job, então uma nova tentativa continua de onde parou.
+    """
+    interaction = job["interaction"]
+    user_id = job["user_id"]
+    first_name = job["first_name"]
+    last_name = job["last_name"]
+    
+    if not job.get("reserved"):
+        # revalida: o job pode ter esperado minutos na fila (banimento, encerramento,
+        # ou outra inscrição usando o mesmo nome nesse meio tempo)
+        if db.is_blacklisted(user_id):
+            await followup_send(
+                interaction,
+                "❌ Você está na blacklist e não pode se inscrever.",
+                ephemeral=True
+            )
+            return
+        if db.get_inscricoes_closed():
+            await followup_send(
+                interaction,
+                "❌ As inscrições foram encerradas antes de a sua ser processada.",
+                ephemeral=True
+            )
+            return
+        if db.is_registered(user_id):
+            await followup_send(interaction, "❌ Você já está inscrito no sorteio!", ephemeral=True)
+            return
+        if db.is_name_taken(first_name, last_name):
+            await followup_send(
+                interaction,
+                "❌ Este nome já foi registrado por outro participante.",
+                ephemeral=True
+            )
+            return
+        
+        member = interaction.guild.get_member(user_id) or interaction.user
+        tag_config = db.get_tag()
+        tickets = utils.calculate_tickets(
+            member,
+            db.get_bonus_roles(),
+            tag_config["enabled"],
+            tag_config["text"],
+            tag_config["quantity"]
+        )
+        # sem await entre a checagem e o registro: o nome fica reservado
+        db.add_participant(user_id, first_name, last_name, tickets)
+        job["reserved"] = True
+        job["tickets"] = tickets
+    
+    if not job.get("message_id"):
+        channel = interaction.guild.get_channel(job["channel_id"])
+        if not channel:
+            raise RuntimeError(f"Canal de inscrições {job['channel_id']} não encontrado")
+        msg = await channel_send(
+            channel,
+            f"<@{user_id}>\n{first_name} {last_name}\n{job['hashtag']}",
+            priority=outbound.PRIORITY_REGISTRATION
+        )
+        job["message_id"] = msg.id
+        db.set_participant_message(user_id, msg.id)
+        if REGISTRATION_REACTIONS:
+            # reação de verificado em segundo plano; não atrasa a confirmação
+            reaction_stamper.stamp(msg)
+    
+    total_tickets = utils.get_total_tickets(job["tickets"])
+    logger.info(f"Nova inscrição: {first_name} {last_name} ({user_id}) - {total_tickets} fichas")
+    try:
+        # a confirmação não pode chegar antes do aviso de "inscrição recebida"
+        await asyncio.wait_for(job["acknowledged"].wait(), 10)
+    except asyncio.TimeoutError:
+        pass
+    try:
+        await followup_send(
+            interaction,
+            f"✅ Inscrição confirmada, {first_name}! Você tem 🎫 {total_tickets} ficha(s).",
+            ephemeral=True
+        )
+    except discord.HTTPException:
+        # token da interação expira em 15 minutos; a inscrição já está feita
+        pass
+
+async def _registration_failed(job: dict, error: Exception):
+    # desfaz a reserva se a mensagem nunca chegou ao canal
+    if job.get("reserved") and not job.get("message_id"):
+        db.remove_participant(job["user_id"])
+    await followup_send(
+        job["interaction"],
+        "❌ Ocorreu um erro ao processar sua inscrição. Tente novamente.",
+        ephemeral=True
+    )
+
+# REGISTRATION_REACTIONS=0 desliga a reação ✅ nas mensagens de inscrição
+REGISTRATION_REACTIONS = os.getenv("REGISTRATION_REACTIONS", "1").lower() not in ("0", "false", "no", "off")
+
+reaction_stamper = registration.ReactionStamper(
+    lambda message: add_reaction(message, "✅"),
+    interval=float(os.getenv("REGISTRATION_REACTION_INTERVAL", "0.5"))
+)
+
+registrations = registration.RegistrationPipeline(
+    _process_registration,
+    on_failure=_registration_failed,
+    workers=int(os.getenv("REGISTRATION_WORKERS", "3")),
+    maxsize=int(os.getenv("REGISTRATION_QUEUE_SIZE", "5000"))
+)
+
 class InscricaoView(discord.ui.View):
     def __init__(self, show_verify: bool = True):
         super().__init__(timeout=None)
@@ -210,6 +425,7 @@ class InscricaoView(discord.ui.View):
         style=discord.ButtonStyle.green,
         custom_id="inscricao_button"
     )
+    @metrics.profiled("button:InscricaoView.inscricao_button")
     async def inscricao_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         # impede inscrições quando encerrado
         try:
@@ -237,6 +453,7 @@ class InscricaoView(discord.ui.View):
         style=discord.ButtonStyle.secondary,
         custom_id="verificar_button"
     )
+    @metrics.profiled("button:InscricaoView.verificar_button")
     async def verificar_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         # reutiliza a mesma lógica do comando /verificar para garantir igualdade
         participant = db.get_participant(interaction.user.id)
@@ -278,6 +495,7 @@ class InscricaoButton(discord.ui.View):
         style=discord.ButtonStyle.green,
         custom_id="inscricao_button"
     )
+    @metrics.profiled("button:InscricaoButton.inscricao_button")
     async def inscricao_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         # impede inscrições quando encerrado
         try:
@@ -299,6 +517,255 @@ class InscricaoButton(discord.ui.View):
         modal = InscricaoModal()
         await interaction.response.send_modal(modal)
 
+class ListaView(discord.ui.View):
+    """
+    Paginador do /lista. As páginas são montadas sob demanda a partir do banco:
+    cada página guarda só o cursor (item, linha) onde começa, então cada clique
+    custa O(página) e linhas nunca são cortadas no meio.
+    """
+    PAGE_LIMIT = 2000
+    # espaço reservado para o rodapé "📄 Página X de Y"
+    FOOTER_RESERVE = 40
+    
+    def __init__(self, owner_id: int, tipo: str, keys: list, timeout: float = 600):
+        super().__init__(timeout=timeout)
+        self.owner_id = owner_id
+        self.tipo = tipo
+        # simples: nomes já ordenados | com_fichas: user_ids
+        self.keys = keys
+        self.header = (
+            "📋 **Lista de Participantes (Simples)**\n" if tipo == "simples"
+            else "📋 **Lista de Participantes (Com Fichas)**\n"
+        )
+        self.starts = [(0, 0)]
+        self.last_page: Optional[int] = None
+        self.page = 0
+    
+    def _item_lines(self, index: int) -> list:
+        if self.tipo == "simples":
+            return [f"{index + 1}. {self.keys[index]}"]
+        data = db.get_participant(self.keys[index])
+        if not data:
+            # saiu do sorteio depois de aberta a lista
+            return []
+        return utils.format_detailed_entry(data["first_name"], data["last_name"], data["tickets"])
+    
+    def _render(self, page: int) -> str:
+        limit = self.PAGE_LIMIT - self.FOOTER_RESERVE
+        item, line = self.starts[page]
+        lines = [self.header] if page == 0 else []
+        size = len(self.header) if page == 0 else 0
+        next_start = None
+        
+        while item < len(self.keys):
+            item_lines = self._item_lines(item)
+            while line < len(item_lines):
+                text = item_lines[line][:limit]
+                added = len(text) + (1 if lines else 0)
+                if lines and size + added > limit:
+                    next_start = (item, line)
+                    break
+                lines.append(text)
+                size += added
+                line += 1
+            if next_start:
+                break
+            item, line = item + 1, 0
+        
+        if page + 1 == len(self.starts):
+            if next_start:
+                self.starts.append(next_start)
+            else:
+                self.last_page = page
+        
+        total = f"{self.last_page + 1}" if self.last_page is not None else "?"
+        lines.append(f"\n📄 Página {page + 1} de {total}")
+        return "\n".join(lines)
+    
+    def render(self) -> str:
+        content = self._render(self.page)
+        self.prev_button.disabled = self.page == 0
+        self.next_button.disabled = self.last_page is not None and self.page >= self.last_page
+        return content
+    
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.owner_id
+    
+    @discord.ui.button(label="◀ Anterior", style=discord.ButtonStyle.secondary)
+    @metrics.profiled("button:ListaView.prev_button")
+    async def prev_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page = max(0, self.page - 1)
+        await interaction.response.edit_message(content=self.render(), view=self)
+    
+    @discord.ui.button(label="Próxima ▶", style=discord.ButtonStyle.secondary)
+    @metrics.profiled("button:ListaView.next_button")
+    async def next_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if self.last_page is None or self.page < self.last_page:
+            self.page += 1
+        await interaction.response.edit_message(content=self.render(), view=self)
+
+class EmbedPageView(discord.ui.View):
+    """
+    Paginador genérico de embeds: `render(page)` monta a página pedida sob
+    demanda (inclusive resolvendo nomes só dos IDs daquela página).
+    """
+    
+    def __init__(self, owner_id: int, page_count: int, render, timeout: float = 600):
+        super().__init__(timeout=timeout)
+        self.owner_id = owner_id
+        self.page_count = max(1, page_count)
+        self.render = render
+        self.page = 0
+    
+    async def build(self) -> discord.Embed:
+        embed = await self.render(self.page)
+        embed.set_footer(text=f"Página {self.page + 1} de {self.page_count}")
+        self.prev_button.disabled = self.page == 0
+        self.next_button.disabled = self.page >= self.page_count - 1
+        return embed
+    
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.owner_id
+    
+    async def _show(self, interaction: discord.Interaction, page: int):
+        self.page = min(max(0, page), self.page_count - 1)
+        # resolver nomes pode levar mais que o prazo da interação
+        await interaction.response.defer()
+        await interaction.edit_original_response(embed=await self.build(), view=self)
+    
+    @discord.ui.button(label="◀ Anterior", style=discord.ButtonStyle.secondary)
+    @metrics.profiled("button:EmbedPageView.prev_button")
+    async def prev_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.page - 1)
+    
+    @discord.ui.button(label="Próxima ▶", style=discord.ButtonStyle.secondary)
+    @metrics.profiled("button:EmbedPageView.next_button")
+    async def next_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.page + 1)
+
+async def send_paginated_embed(interaction: discord.Interaction, page_count: int, render):
+    """
+    Responde com a primeira página; só anexa os botões se houver mais de uma.
+    """
+    view = EmbedPageView(interaction.user.id, page_count, render)
+    await interaction.response.defer(ephemeral=True)
+    embed = await view.build()
+    if view.page_count > 1:
+        await followup_send(interaction, embed=embed, view=view, ephemeral=True)
+    else:
+        await followup_send(interaction, embed=embed, ephemeral=True)
+
+# cache de nomes de usuário (ID -> (nome, expira_em)) para listagens
+USER_NAME_TTL = 3600.0
+# entradas máximas no cache; as mais antigas saem primeiro
+USER_NAME_CACHE_SIZE = 5000
+# buscas simultâneas na API para nomes fora do cache
+USER_FETCH_CONCURRENCY = 5
+# em ordem de inserção = ordem de expiração (TTL fixo, reinserção vai para o fim)
+_user_name_cache: OrderedDict = OrderedDict()
+_user_fetch_semaphore: Optional[asyncio.Semaphore] = None
+
+def _cached_user_name(user_id: int) -> Optional[str]:
+    entry = _user_name_cache.get(user_id)
+    if entry and entry[1] > time.monotonic():
+        return entry[0]
+    return None
+
+def _cache_user_name(user_id: int, name: str):
+    now = time.monotonic()
+    _user_name_cache[user_id] = (name, now + USER_NAME_TTL)
+    _user_name_cache.move_to_end(user_id)
+    # descarta do início as expiradas e o que passar do limite
+    while _user_name_cache:
+        oldest_id, (_, expires_at) = next(iter(_user_name_cache.items()))
+        if expires_at > now and len(_user_name_cache) <= USER_NAME_CACHE_SIZE:
+            break
+        del _user_name_cache[oldest_id]
+
+async def resolve_user_names(guild: Optional[discord.Guild], user_ids) -> dict:
+    """
+    Resolve nomes de usuário: cache com TTL, cache de membros do servidor,
+    bot.get_user e, só para o que faltar, fetch_user em paralelo (limitado).
+    
+    Returns:
+        Dict user_id (int) -> nome
+    """
+    global _user_fetch_semaphore
+    names = {}
+    missing = []
+    for raw_id in user_ids:
+        user_id = int(raw_id)
+        name = _cached_user_name(user_id)
+        if name is None:
+            user = (guild.get_member(user_id) if guild else None) or bot.get_user(user_id)
+            if user is not None:
+                name = user.name
+                _cache_user_name(user_id, name)
+        if name is None:
+            missing.append(user_id)
+        else:
+            names[user_id] = name
+    
+    if missing:
+        if _user_fetch_semaphore is None:
+            _user_fetch_semaphore = asyncio.Semaphore(USER_FETCH_CONCURRENCY)
+        
+        async def fetch(user_id: int):
+            async with _user_fetch_semaphore:
+                try:
+                    user = await bot.fetch_user(user_id)
+                except discord.NotFound:
+                    name = f"Usuário desconhecido ({user_id})"
+                except discord.HTTPException as e:
+                    logger.warning(f"Erro ao buscar usuário {user_id}: {e}")
+                    names[user_id] = f"ID {user_id}"
+                    return
+                else:
+                    name = user.name
+                _cache_user_name(user_id, name)
+                names[user_id] = name
+        
+        await asyncio.gather(*(fetch(user_id) for user_id in missing))
+    return names
+
+# intervalo (segundos) entre snapshots do /metrics
+METRICS_PUBLISH_INTERVAL = float(os.getenv("METRICS_PUBLISH_INTERVAL", "5"))
+
+def _collect_gauges(registrations_per_second: float) -> dict:
+    stats = db.get_statistics()
+    gauges = {
+        ("registrations_per_second", ""): registrations_per_second,
+        ("registrations_processed", ""): registrations.stats["processed"],
+        ("registrations_failed", ""): registrations.stats["failed"],
+        ("queue_depth", "registration"): registrations.depth(),
+        ("queue_depth", "reaction"): reaction_stamper.depth(),
+        ("queue_depth", "chat_delete"): chat_deletions.depth(),
+        ("participants", ""): stats["total_participants"],
+        ("tickets", ""): stats["total_tickets"],
+        ("participants_with_tag", ""): stats["participants_with_tag"],
+        ("gateway_latency_seconds", ""): bot.latency,
+    }
+    for priority, name in outbound.PRIORITY_NAMES.items():
+        gauges[("queue_depth", f"outbound_{name}")] = outbound_scheduler.depth(priority)
+    return gauges
+
+async def publish_metrics(interval: float = METRICS_PUBLISH_INTERVAL):
+    """
+    Publica periodicamente o snapshot lido pelo /metrics (renderizado aqui, no event loop).
+    """
+    last_processed = registrations.stats["processed"]
+    last_time = time.monotonic()
+    while True:
+        try:
+            now = time.monotonic()
+            processed = registrations.stats["processed"]
+            rate = (processed - last_processed) / max(now - last_time, 1e-9)
+            last_processed, last_time = processed, now
+            metrics.publish(_collect_gauges(rate))
+        except Exception as e:
+            logger.error(f"Erro ao publicar métricas: {e}")
+        await asyncio.sleep(interval)
+
 @bot.event
 async def on_ready():
     logger.info(f"Bot conectado como {bot.user}")
@@ -322,28 +789,82 @@ async def on_ready():
     except Exception as e:
         logger.error(f"Erro ao re-registrar view: {e}")
     
+    # retoma um /atualizar interrompido por reinício
+    checkpoint = db.get_recalc_checkpoint()
+    if checkpoint and not recalc_job_running():
+        guild = bot.get_guild(int(checkpoint.get("guild_id") or 0))
+        if guild:
+            logger.info(f"Retomando recálculo de fichas a partir de {checkpoint.get('cursor')}")
+            start_recalc_job(guild, dict(checkpoint))
+        else:
+            logger.warning("Recálculo de fichas pendente para um servidor indisponível; descartado")
+            db.set_recalc_checkpoint(None)
+    
     try:
         synced = await bot.tree.sync()
         logger.info(f"Sincronizados {len(synced)} comandos")
     except Exception as e:
         logger.error(f"Erro ao sincronizar comandos: {e}")
 
+# mensagens do chat bloqueado são apagadas em lote por canal
+chat_deletions = deletion_queue.DeletionQueue(
+    max_pending=int(os.getenv("CHAT_DELETE_MAX_PENDING", "1000")),
+    scheduler=outbound_scheduler
+)
+
 @bot.event
+@metrics.profiled("event:on_message")
 async def on_message(message):
     if message.author.bot:
         return
     
-    chat_lock = db.get_chat_lock()
-    if chat_lock["enabled"] and chat_lock["channel_id"]:
-        if message.channel.id == chat_lock["channel_id"]:
-            if not message.author.guild_permissions.administrator and not db.is_moderator(message.author.id):
-                try:
-                    await message.delete()
-                except Exception as e:
-                    logger.error(f"Erro ao deletar mensagem no chat bloqueado: {e}")
+    guard = db.get_chat_guard()
+    if guard.channel_id is not None and message.channel.id == guard.channel_id:
+        if message.author.id not in guard.moderators:
+            if not message.author.guild_permissions.administrator:
+                await chat_deletions.enqueue(message)
     
     await bot.process_commands(message)
 
+@bot.event
+async def on_member_update(before: discord.Member, after: discord.Member):
+    # cargos e apelido afetam fichas de cargo e detecção da TAG
+    if before.roles == after.roles and before.nick == after.nick:
+        return
+    if not db.is_registered(after.id):
+        return
+    if recalc_participants(after.guild, [after.id]):
+        logger.info(f"Fichas de {after} atualizadas após mudança de cargos/apelido")
+
+@bot.event
+async def on_user_update(before: discord.User, after: discord.User):
+    _user_name_cache.pop(after.id, None)
+    # nome de usuário/global entram na detecção da TAG
+    if before.name == after.name and before.global_name == after.global_name:
+        return
+    if not db.is_registered(after.id):
+        return
+    for guild in bot.guilds:
+        if guild.get_member(after.id) and recalc_participants(guild, [after.id]):
+            logger.info(f"Fichas de {after} atualizadas após mudança de nome")
+            break
+
+@bot.event
+async def on_guild_role_delete(role: discord.Role):
+    holders = db.get_participants_with_role(role.id)
+    if holders:
+        changed = recalc_participants(role.guild, holders)
+        logger.info(f"Cargo {role.name} removido: {changed} participante(s) com fichas atualizadas")
+
+@bot.event
+async def on_guild_role_update(before: discord.Role, after: discord.Role):
+    # o nome do cargo também é usado na detecção da TAG
+    if before.name == after.name or not db.get_tag().get("enabled"):
+        return
+    holders = {str(m.id) for m in after.members}
+    if holders:
+        recalc_participants(after.guild, holders)
+
 # Para comandos administrativos:
 @bot.tree.command(name="setup_inscricao", description="[ADMIN] Configura o sistema de inscrições")
 @app_commands.guild_only()
@@ -355,6 +876,7 @@ async def on_message(message):
     midia="Imagem ou vídeo opcional",
     verificar_botao="Exibir botão 'Verificar minha inscrição' na mensagem? (True/False)"
 )
+@metrics.profiled("command:setup_inscricao")
 async def setup_inscricao(
     interaction: discord.Interaction,
     canal_botao: discord.TextChannel,
@@ -393,9 +915,9 @@ async def setup_inscricao(
             files.append(file)
         
         if files:
-            msg = await canal_botao.send(content=content, view=view, files=files)
+            msg = await channel_send(canal_botao, content=content, view=view, files=files)
         else:
-            msg = await canal_botao.send(content=content, view=view)
+            msg = await channel_send(canal_botao, content=content, view=view)
         
         # tenta usar API de DB que adiciona message_id a uma lista (se disponível)
         try:
@@ -405,7 +927,8 @@ async def setup_inscricao(
             db.set_button_message_id(msg.id)
         bot.add_view(view, message_id=msg.id)
         
-        await interaction.followup.send(
+        await followup_send(
+            interaction,
             f"✅ Sistema de inscrições configurado!\n"
             f"**Canal do botão**: {canal_botao.mention}\n"
             f"**Canal de inscrições**: {canal_inscricoes.mention}\n"
@@ -417,7 +940,8 @@ async def setup_inscricao(
         
     except Exception as e:
         logger.error(f"Erro no setup_inscricao: {e}", exc_info=True)
-        await interaction.followup.send(
+        await followup_send(
+            interaction,
             f"❌ Erro ao configurar: {str(e)}",
             ephemeral=True
         )
@@ -426,6 +950,7 @@ async def setup_inscricao(
 @app_commands.guild_only()
 @admin_or_mod_check()
 @app_commands.describe(hashtag="Hashtag obrigatória para inscrição")
+@metrics.profiled("command:hashtag")
 async def hashtag(interaction: discord.Interaction, hashtag: str):
     if not is_admin_or_moderator(interaction):  # ✅ ADICIONE ISTO
         await interaction.response.send_message(
@@ -458,6 +983,7 @@ async def hashtag(interaction: discord.Interaction, hashtag: str):
     texto="Texto da tag do servidor",
     quantidade="Quantidade de fichas bônus pela tag"
 )
+@metrics.profiled("command:tag")
 async def tag(
     interaction: discord.Interaction,
     acao: Literal["on", "off", "status"],
@@ -541,16 +1067,35 @@ async def tag(
             )
             return
         
+        previous = dict(db.get_tag())
         db.set_tag(True, texto, quantidade)
+        
+        if previous["enabled"] and previous["text"] == texto:
+            # só a quantidade mudou: basta recalcular quem já tem a TAG
+            changed = recalc_participants(interaction.guild, db.get_participants_with_tag())
+            recalc_info = f"🔄 Fichas recalculadas: {changed} participante(s)"
+        elif recalc_job_running():
+            recalc_info = "⚠️ Há um recálculo em andamento; rode `/atualizar` ao final dele."
+        else:
+            # texto novo pode aparecer no nome de qualquer participante
+            state = _new_recalc_state(interaction.guild, interaction.user.id)
+            db.set_recalc_checkpoint(state)
+            start_recalc_job(interaction.guild, state)
+            recalc_info = f"🔄 Recalculando fichas de {state['total']} participante(s) em segundo plano."
+        
         await interaction.response.send_message(
-            f"✅ TAG ativada!\n**Texto**: {texto}\n**Fichas bônus**: {quantidade}",
+            f"✅ TAG ativada!\n**Texto**: {texto}\n**Fichas bônus**: {quantidade}\n{recalc_info}",
             ephemeral=True
         )
         logger.info(f"TAG ativada: '{texto}' ({quantidade} fichas) por {interaction.user}")
     
     elif acao == "off":
         db.set_tag(False)
-        await interaction.response.send_message("❌ TAG desativada!", ephemeral=True)
+        changed = recalc_participants(interaction.guild, db.get_participants_with_tag())
+        await interaction.response.send_message(
+            f"❌ TAG desativada!\n🔄 Fichas recalculadas: {changed} participante(s)",
+            ephemeral=True
+        )
         logger.info(f"TAG desativada por {interaction.user}")
 
 @bot.tree.command(name="fichas", description="[ADMIN] Adiciona um cargo bônus")
@@ -562,6 +1107,7 @@ async def tag(
     quantidade="Quantidade de fichas bônus",
     abreviacao="Abreviação do cargo (ex: S.B) - OBRIGATÓRIA"
 )
+@metrics.profiled("command:fichas")
 async def fichas(
     interaction: discord.Interaction,
     cargo: discord.Role,
@@ -586,10 +1132,16 @@ async def fichas(
     
     db.add_bonus_role(cargo.id, quantidade, abbrev)
     
+    # recalcula só quem tem o cargo agora ou já recebia fichas por ele
+    affected = {str(m.id) for m in cargo.members}
+    affected.update(db.get_participants_with_role(cargo.id))
+    changed = recalc_participants(interaction.guild, affected)
+    
     await interaction.response.send_message(
         f"✅ Cargo {cargo.mention} configurado!\n"
         f"**Fichas bônus**: {quantidade}\n"
-        f"**Abreviação**: {abbrev}",
+        f"**Abreviação**: {abbrev}\n"
+        f"🔄 Fichas recalculadas: {changed} participante(s)",
         ephemeral=True
     )
     
@@ -599,6 +1151,7 @@ async def fichas(
 @app_commands.guild_only()
 @admin_or_mod_check()  # <-- ADICIONE ESTA LINHA
 @app_commands.describe(cargo="Cargo a ser removido dos bônus")
+@metrics.profiled("command:tirar")
 async def tirar(interaction: discord.Interaction, cargo: discord.Role):
     if not is_admin_or_moderator(interaction):  # ✅ ADICIONE ISTO
         await interaction.response.send_message(
@@ -608,8 +1161,10 @@ async def tirar(interaction: discord.Interaction, cargo: discord.Role):
         return
     
     if db.remove_bonus_role(cargo.id):
+        changed = recalc_participants(interaction.guild, db.get_participants_with_role(cargo.id))
         await interaction.response.send_message(
-            f"✅ Cargo {cargo.mention} removido dos bônus!",
+            f"✅ Cargo {cargo.mention} removido dos bônus!\n"
+            f"🔄 Fichas recalculadas: {changed} participante(s)",
             ephemeral=True
         )
         logger.info(f"Cargo bônus removido: {cargo.name} por {interaction.user}")
@@ -623,6 +1178,7 @@ async def tirar(interaction: discord.Interaction, cargo: discord.Role):
 @app_commands.guild_only()
 @admin_or_mod_check()  # <-- ADICIONE ESTA LINHA
 @app_commands.describe(tipo="Tipo de listagem")
+@metrics.profiled("command:lista")
 async def lista(interaction: discord.Interaction, tipo: Literal["simples", "com_fichas"]):
     if not is_admin_or_moderator(interaction):  # ✅ ADICIONE ISTO
         await interaction.response.send_message(
@@ -640,41 +1196,46 @@ async def lista(interaction: discord.Interaction, tipo: Literal["simples", "com_
         )
         return
     
-    await interaction.response.defer(ephemeral=True)
-    
-    lines = []
-    
     if tipo == "simples":
-        lines.append("📋 **Lista de Participantes (Simples)**\n")
-        names = [f"{data['first_name']} {data['last_name']}" for _, data in participants.items()]
-        names.sort(key=lambda s: s.lower())
-        for i, name in enumerate(names, 1):
-            lines.append(f"{i}. {name}")
-    
+        keys = sorted((f"{data['first_name']} {data['last_name']}" for data in participants.values()),
+                      key=str.lower)
     else:
-        lines.append("📋 **Lista de Participantes (Com Fichas)**\n")
-        for user_id, data in participants.items():
-            entries = utils.format_detailed_entry(
-                data["first_name"],
-                data["last_name"],
-                data["tickets"]
-            )
-            lines.extend(entries)
+        keys = list(participants.keys())
     
-    content = "\n".join(lines)
-    
-    if len(content) > 2000:
-        chunks = [content[i:i+2000] for i in range(0, len(content), 2000)]
-        for chunk in chunks:
-            await interaction.followup.send(chunk, ephemeral=True)
+    view = ListaView(interaction.user.id, tipo, keys)
+    content = view.render()
+    if view.last_page == 0:
+        await interaction.response.send_message(content, ephemeral=True)
     else:
-        await interaction.followup.send(content, ephemeral=True)
+        await interaction.response.send_message(content, view=view, ephemeral=True)
+
+def _build_export(rows: list, tipo: str, compress: bool, size_limit: int):
+    """
+    Gera o arquivo do /exportar fora do event loop. Se passar do limite de
+    anexo do servidor sem compressão, refaz com gzip.
+    """
+    buf = utils.write_export(utils.iter_export_lines(rows, tipo), compress)
+    if not compress and size_limit and buf.seek(0, os.SEEK_END) > size_limit:
+        buf.close()
+        buf = utils.write_export(utils.iter_export_lines(rows, tipo), True)
+        compress = True
+    size = buf.seek(0, os.SEEK_END)
+    buf.seek(0)
+    return buf, compress, size
 
 @bot.tree.command(name="exportar", description="[ADMIN] Exporta lista de participantes")
 @app_commands.guild_only()
 @admin_or_mod_check()  # <-- ADICIONE ESTA LINHA
-@app_commands.describe(tipo="Tipo de exportação")
-async def exportar(interaction: discord.Interaction, tipo: Literal["simples", "com_fichas"]):
+@app_commands.describe(
+    tipo="Tipo de exportação (contagem/csv/jsonl: uma linha por participante)",
+    compactar="Compacta o arquivo com gzip (automático se passar do limite de anexo)"
+)
+@metrics.profiled("command:exportar")
+async def exportar(
+    interaction: discord.Interaction,
+    tipo: Literal["simples", "com_fichas", "contagem", "csv", "jsonl"],
+    compactar: Optional[bool] = False
+):
     if not is_admin_or_moderator(interaction):  # ✅ ADICIONE ISTO
         await interaction.response.send_message(
             "❌ Você não tem permissão para usar este comando.",
@@ -692,43 +1253,186 @@ async def exportar(interaction: discord.Interaction, tipo: Literal["simples", "c
         return
     
     await interaction.response.defer(ephemeral=True)
-    lines = []
-    
-    if tipo == "simples":
-        names = [f"{data['first_name']} {data['last_name']}" for _, data in participants.items()]
-        names.sort(key=lambda s: s.lower())
-        
-        lines.append("📋 Lista de Participantes (Simples)\n")
-        for i, name in enumerate(names, 1):
-            lines.append(f"{i}. {name}")
-    else:
-        lines.append("📋 Lista de Participantes (Com Fichas)\n")
-        for user_id, data in participants.items():
-            entries = utils.format_detailed_entry(
-                data["first_name"],
-                data["last_name"],
-                data["tickets"]
-            )
-            lines.extend(entries)
     
-    content = "\n".join(lines)
+    # cópia rasa da lista: o gerador roda em outra thread enquanto o loop segue alterando o banco
+    rows = list(participants.items())
+    size_limit = interaction.guild.filesize_limit if interaction.guild else 0
+    buf, compressed, size = await asyncio.to_thread(_build_export, rows, tipo, bool(compactar), size_limit)
+    
+    if size_limit and size > size_limit:
+        buf.close()
+        await followup_send(
+            interaction,
+            f"❌ O arquivo ficou com {size / 1024 / 1024:.1f} MB{' mesmo com gzip' if compressed else ''}, "
+            f"acima do limite de anexo do servidor ({size_limit / 1024 / 1024:.1f} MB). "
+            "Tente um tipo mais enxuto (ex: `contagem`).",
+            ephemeral=True
+        )
+        logger.warning(f"Exportação ({tipo}) de {size} bytes acima do limite de {size_limit} bytes")
+        return
     
-    filename = f"participantes_{tipo}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-    with open(filename, 'w', encoding='utf-8') as f:
-        f.write(content)
+    filename = f"participantes_{tipo}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{utils.EXPORT_EXTENSIONS[tipo]}"
+    if compressed:
+        filename += ".gz"
     
-    await interaction.followup.send(
-        f"✅ Lista exportada! Total: {len(participants)} participante(s)",
-        file=discord.File(filename),
-        ephemeral=True
+    try:
+        await followup_send(
+            interaction,
+            f"✅ Lista exportada! Total: {len(rows)} participante(s)",
+            file=discord.File(buf, filename=filename),
+            ephemeral=True
+        )
+    finally:
+        buf.close()
+    logger.info(f"Lista exportada ({tipo}, {size} bytes{', gzip' if compressed else ''}) por {interaction.user}")
+
+# participantes recalculados por lote antes de devolver o controle ao loop
+RECALC_BATCH_SIZE = int(os.getenv("RECALC_BATCH_SIZE", "200"))
+# intervalo mínimo (segundos) entre edições da mensagem de progresso
+RECALC_PROGRESS_INTERVAL = 2.0
+
+_recalc_task: Optional[asyncio.Task] = None
+
+def _format_recalc_progress(state: dict, finished: bool = False) -> str:
+    done = state["updated"] + state["unchanged"] + state["skipped"] + state["errors"]
+    header = "✅ Fichas atualizadas!" if finished else "⏳ Recalculando fichas..."
+    return (
+        f"{header}\n"
+        f"**Progresso**: {done}/{state['total']}\n"
+        f"**Atualizados**: {state['updated']}\n"
+        f"**Sem alteração**: {state['unchanged']}\n"
+        f"**Fora do servidor**: {state['skipped']}\n"
+        f"**Erros**: {state['errors']}"
     )
+
+async def run_recalc_job(guild: discord.Guild, state: dict, progress_message=None):
+    """
+    Recalcula as fichas em lotes, salvando o cursor após cada lote.
+    
+    O cursor é o último user_id processado (em ordem), então o job pode ser
+    retomado após reiniciar o bot a partir de db.get_recalc_checkpoint().
+    """
+    cursor = state.get("cursor")
+    pending = [uid for uid in sorted(db.get_all_participants()) if cursor is None or uid > cursor]
+    last_edit = 0.0
+
+    for start in range(0, len(pending), RECALC_BATCH_SIZE):
+        batch = pending[start:start + RECALC_BATCH_SIZE]
+        participants = db.get_all_participants()
+        # regras montadas por lote: pegam mudanças de /fichas e /tag no meio do job
+        rules = utils.TicketRules.from_config(db.get_bonus_roles(), db.get_tag())
+        recalculated = {}
+
+        for user_id in batch:
+            data = participants.get(user_id)
+            if data is None:
+                # removido durante o recálculo
+                state["skipped"] += 1
+                continue
+            try:
+                member = guild.get_member(int(user_id))
+                if not member:
+                    state["skipped"] += 1
+                    continue
+                # preserva a TAG manual concedida por /tag_manual
+                recalculated[user_id] = rules.compute(
+                    member,
+                    manual_tag=(data.get("tickets") or {}).get("manual_tag")
+                )
+            except Exception as e:
+                logger.error(f"Erro ao atualizar fichas do usuário {user_id}: {e}")
+                state["errors"] += 1
+
+        # grava só quem mudou, em um único lote
+        changed = db.update_tickets_bulk(recalculated)
+        state["updated"] += changed
+        state["unchanged"] += len(recalculated) - changed
+        state["cursor"] = batch[-1]
+        db.set_recalc_checkpoint(state)
+
+        now = asyncio.get_running_loop().time()
+        if progress_message and now - last_edit >= RECALC_PROGRESS_INTERVAL:
+            last_edit = now
+            try:
+                await message_edit(progress_message, content=_format_recalc_progress(state))
+            except Exception:
+                # token da interação expirou: segue sem progresso visual
+                progress_message = None
+
+        # devolve o controle ao loop entre lotes
+        await asyncio.sleep(0)
+
+    db.set_recalc_checkpoint(None)
+    if progress_message:
+        try:
+            await message_edit(progress_message, content=_format_recalc_progress(state, finished=True))
+        except Exception:
+            pass
+    logger.info(f"Recálculo de fichas concluído: {state['updated']} alterados, "
+                f"{state['unchanged']} sem alteração, {state['skipped']} fora do servidor, "
+                f"{state['errors']} erros")
+
+def start_recalc_job(guild: discord.Guild, state: dict, progress_message=None) -> asyncio.Task:
+    global _recalc_task
+    _recalc_task = asyncio.create_task(run_recalc_job(guild, state, progress_message))
+    _recalc_task.add_done_callback(_log_recalc_failure)
+    return _recalc_task
+
+def _log_recalc_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception():
+        logger.error("Erro no recálculo de fichas", exc_info=task.exception())
+
+def _new_recalc_state(guild: discord.Guild, started_by: Optional[int]) -> dict:
+    return {
+        "guild_id": guild.id,
+        "cursor": None,
+        "total": len(db.get_all_participants()),
+        "updated": 0,
+        "unchanged": 0,
+        "skipped": 0,
+        "errors": 0,
+        "started_by": started_by,
+        "started_at": datetime.now().isoformat()
+    }
+
+def recalc_participants(guild: discord.Guild, user_ids) -> int:
+    """
+    Recalcula as fichas só dos participantes indicados.
     
-    os.remove(filename)
-    logger.info(f"Lista exportada ({tipo}) por {interaction.user}")
+    Usado pelos eventos de membro/cargo e pelas mudanças de configuração, para
+    manter as fichas em dia sem recalcular todo mundo.
+    
+    Returns:
+        Quantidade de participantes cujas fichas mudaram
+    """
+    participants = db.get_all_participants()
+    rules = utils.TicketRules.from_config(db.get_bonus_roles(), db.get_tag())
+    recalculated = {}
+    
+    for user_id in {str(uid) for uid in user_ids}:
+        data = participants.get(user_id)
+        if data is None:
+            continue
+        member = guild.get_member(int(user_id))
+        if not member:
+            continue
+        try:
+            recalculated[user_id] = rules.compute(
+                member,
+                manual_tag=(data.get("tickets") or {}).get("manual_tag")
+            )
+        except Exception as e:
+            logger.error(f"Erro ao recalcular fichas do usuário {user_id}: {e}")
+    
+    return db.update_tickets_bulk(recalculated)
+
+def recalc_job_running() -> bool:
+    return bool(_recalc_task and not _recalc_task.done())
 
 @bot.tree.command(name="atualizar", description="[ADMIN] Recalcula fichas de todos os participantes")
 @app_commands.guild_only()
 @admin_or_mod_check()  # <-- ADICIONE ESTA LINHA
+@metrics.profiled("command:atualizar")
 async def atualizar(interaction: discord.Interaction):
     if not is_admin_or_moderator(interaction):  # ✅ ADICIONE ISTO
         await interaction.response.send_message(
@@ -737,48 +1441,34 @@ async def atualizar(interaction: discord.Interaction):
         )
         return
     
-    await interaction.response.defer(ephemeral=True)
-    
-    participants = db.get_all_participants()
-    bonus_roles = db.get_bonus_roles()
-    tag_config = db.get_tag()
+    if recalc_job_running():
+        await interaction.response.send_message(
+            "⏳ Já existe um recálculo de fichas em andamento.",
+            ephemeral=True
+        )
+        return
     
-    updated = 0
-    errors = 0
+    await interaction.response.defer(ephemeral=True)
     
-    for user_id, data in participants.items():
-        try:
-            member = interaction.guild.get_member(int(user_id))
-            if not member:
-                continue
-            
-            new_tickets = utils.calculate_tickets(
-                member,
-                bonus_roles,
-                tag_config["enabled"],
-                tag_config["text"],
-                tag_config["quantity"]
-            )
-            
-            db.update_tickets(int(user_id), new_tickets)
-            updated += 1
-        except Exception as e:
-            logger.error(f"Erro ao atualizar fichas do usuário {user_id}: {e}")
-            errors += 1
+    state = _new_recalc_state(interaction.guild, interaction.user.id)
+    db.set_recalc_checkpoint(state)
     
-    await interaction.followup.send(
-        f"✅ Fichas atualizadas!\n"
-        f"**Atualizados**: {updated}\n"
-        f"**Erros**: {errors}",
-        ephemeral=True
+    progress_message = await followup_send(
+        interaction,
+        _format_recalc_progress(state),
+        ephemeral=True,
+        wait=True
     )
+    start_recalc_job(interaction.guild, state, progress_message)
     
-    logger.info(f"Fichas atualizadas por {interaction.user}: {updated} sucesso, {errors} erros")
+    logger.info(f"Recálculo de fichas iniciado por {interaction.user}: {state['total']} participante(s)")
 
 @bot.tree.command(name="estatisticas", description="[ADMIN] Mostra estatísticas do sorteio")
 @app_commands.guild_only()
 @admin_or_mod_check()  # <-- ADICIONE ESTA LINHA
-async def estatisticas(interaction: discord.Interaction):
+@app_commands.describe(verificar="Confere os totais com um recálculo completo (lento em listas grandes)")
+@metrics.profiled("command:estatisticas")
+async def estatisticas(interaction: discord.Interaction, verificar: Optional[bool] = False):
     if not is_admin_or_moderator(interaction):  # ✅ ADICIONE ISTO
         await interaction.response.send_message(
             "❌ Você não tem permissão para usar este comando.",
@@ -786,6 +1476,9 @@ async def estatisticas(interaction: discord.Interaction):
         )
         return
     
+    if verificar and not db.verify_statistics():
+        logger.warning(f"Estatísticas divergentes corrigidas (verificação por {interaction.user})")
+    
     stats = db.get_statistics()
     
     embed = discord.Embed(
@@ -833,8 +1526,309 @@ async def estatisticas(interaction: discord.Interaction):
         inline=True
     )
     
+    deletions = chat_deletions.metrics()
+    if deletions["enqueued"]:
+        embed.add_field(
+            name="🧹 Chat Bloqueado",
+            value=(
+                f"Na fila: {deletions['depth']} (pico {deletions['max_depth']})\n"
+                f"Apagadas em lote: {deletions['bulk_deleted']} ({deletions['bulk_calls']} chamadas)\n"
+                f"Apagadas individualmente: {deletions['single_deleted']} | Falhas: {deletions['failed']}"
+            ),
+            inline=False
+        )
+    
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
+@bot.tree.command(name="desempenho", description="[ADMIN] Latência dos comandos e do event loop")
+@app_commands.guild_only()
+@admin_or_mod_check()
+@metrics.profiled("command:desempenho")
+async def desempenho(interaction: discord.Interaction):
+    if not is_admin_or_moderator(interaction):
+        await interaction.response.send_message(
+            "❌ Você não tem permissão para usar este comando.",
+            ephemeral=True
+        )
+        return
+    
+    summary = metrics.handler_summary()
+    ms = lambda seconds: f"{seconds * 1000:.0f}"
+    lines = ["⏱️ **Desempenho** (ms, p50/p95/p99 das últimas execuções)\n"]
+    
+    lag = metrics.histogram("event_loop_lag_seconds").quantiles()
+    lines.append(f"**Atraso do event loop**: {ms(lag[0.5])}/{ms(lag[0.95])}/{ms(lag[0.99])}")
+    lines.append(f"**Latência do gateway**: {ms(bot.latency)}\n")
+    
+    # mais lentos primeiro (p95)
+    for name, info in sorted(summary.items(), key=lambda item: item[1]["wall"][0.95], reverse=True):
+        wall, db_time = info["wall"], info["db"]
+        errors = f" ({info['errors']} erros)" if info["errors"] else ""
+        lines.append(
+            f"`{name}` ×{info['calls']}{errors}: "
+            f"{ms(wall[0.5])}/{ms(wall[0.95])}/{ms(wall[0.99])}"
+            f" | db p95 {ms(db_time.get(0.95, 0))} | REST {info['rest_avg']:.1f}"
+        )
+    
+    content = ""
+    for line in lines:
+        if len(content) + len(line) + 1 > 2000:
+            break
+        content += line + "\n"
+    await interaction.response.send_message(content, ephemeral=True)
+
+SORTEIO_DIR = os.getenv("SORTEIO_DIR", "sorteios")
+SORTEIO_LOG = os.path.join(SORTEIO_DIR, "commitments.jsonl")
+
+def _freeze_draw(participants: list, frozen_by: str, entropy_source: str) -> dict:
+    """
+    Congela o snapshot (user_id, fichas), grava o arquivo e registra os
+    compromissos no log. Roda fora do event loop (I/O em disco).
+
+    A fonte de entropia (ex.: um concurso de loteria futuro) é declarada aqui,
+    junto com os compromissos: quem guarda a semente não pode escolher a
+    entropia depois, testando valores até sair o ganhador desejado.
+    """
+    os.makedirs(SORTEIO_DIR, exist_ok=True)
+    entries = sorteio.canonical_entries({
+        user_id: utils.get_total_tickets(data.get("tickets"))
+        for user_id, data in participants
+    })
+    secret_seed = secrets.token_hex(32)
+    frozen_at = datetime.now()
+    path = os.path.join(SORTEIO_DIR, f"snapshot_{frozen_at.strftime('%Y%m%d_%H%M%S')}.jsonl")
+    snapshot_sha256 = sorteio.write_snapshot(path, entries)
+    state = {
+        "snapshot_file": path,
+        "snapshot_sha256": snapshot_sha256,
+        "seed": secret_seed,
+        "seed_sha256": sorteio.seed_commitment(secret_seed),
+        "participants": len(entries),
+        "total_tickets": sum(t for _, t in entries),
+        "entropy_source": entropy_source,
+        "frozen_at": frozen_at.isoformat(),
+        "frozen_by": frozen_by
+    }
+    sorteio.append_log(SORTEIO_LOG, {
+        "event": "commit",
+        "snapshot_sha256": snapshot_sha256,
+        "seed_sha256": state["seed_sha256"],
+        "participants": state["participants"],
+        "total_tickets": state["total_tickets"],
+        "entropy_source": entropy_source,
+        "by": frozen_by
+    })
+    return state
+
+def _run_frozen_draw(state: dict, winners: int, entropy: str, drawn_by: str) -> list:
+    """
+    Relê o snapshot congelado, confere o hash e realiza o sorteio.
+    """
+    entries, snapshot_sha256 = sorteio.read_snapshot(state["snapshot_file"])
+    if snapshot_sha256 != state["snapshot_sha256"]:
+        raise ValueError("O arquivo do snapshot foi alterado depois de congelado")
+    seed = sorteio.effective_seed(state["seed"], snapshot_sha256, entropy)
+    results = sorteio.draw(entries, winners, seed)
+    sorteio.append_log(SORTEIO_LOG, {
+        "event": "reveal",
+        "snapshot_sha256": snapshot_sha256,
+        "seed": state["seed"],
+        "seed_sha256": state["seed_sha256"],
+        "entropy_source": state.get("entropy_source", ""),
+        "entropy": sorteio.normalize_entropy(entropy),
+        "winners": [r["user_id"] for r in results],
+        "by": drawn_by
+    })
+    return results
+
+@bot.tree.command(name="sortear", description="[ADMIN] Sorteio verificável proporcional às fichas")
+@app_commands.guild_only()
+@admin_or_mod_check()
+@app_commands.describe(
+    acao="congelar: publica o compromisso | realizar: sorteia e revela a semente",
+    quantidade="Quantidade de ganhadores (sem repetição)",
+    fonte_entropia="(congelar) Fonte pública futura de entropia (ex: Mega-Sena concurso 2800)",
+    entropia="(realizar) Resultado da fonte declarada no congelamento"
+)
+@metrics.profiled("command:sortear")
+async def sortear(
+    interaction: discord.Interaction,
+    acao: Literal["congelar", "realizar", "status", "cancelar"],
+    quantidade: Optional[int] = 1,
+    fonte_entropia: Optional[str] = None,
+    entropia: Optional[str] = None
+):
+    if not is_admin_or_moderator(interaction):
+        await interaction.response.send_message(
+            "❌ Você não tem permissão para usar este comando.",
+            ephemeral=True
+        )
+        return
+    
+    pending = db.get_pending_draw()
+    
+    if acao == "status":
+        if not pending:
+            await interaction.response.send_message(
+                "📋 Nenhum sorteio congelado. Use `/sortear acao:congelar`.",
+                ephemeral=True
+            )
+            return
+        await interaction.response.send_message(
+            f"🧊 **Sorteio congelado** em {pending['frozen_at']}\n"
+            f"**Participantes**: {pending['participants']} | **Fichas**: {pending['total_tickets']}\n"
+            f"**SHA-256 do snapshot**: `{pending['snapshot_sha256']}`\n"
+            f"**Compromisso da semente**: `{pending['seed_sha256']}`"
+            + (f"\n**Fonte de entropia**: {pending['entropy_source']}" if pending.get("entropy_source") else ""),
+            ephemeral=True
+        )
+        return
+    
+    if acao == "cancelar":
+        if not pending:
+            await interaction.response.send_message("📋 Nenhum sorteio congelado.", ephemeral=True)
+            return
+        db.set_pending_draw(None)
+        await asyncio.to_thread(sorteio.append_log, SORTEIO_LOG, {
+            "event": "cancel",
+            "snapshot_sha256": pending["snapshot_sha256"],
+            "seed": pending["seed"],
+            "seed_sha256": pending["seed_sha256"],
+            "by": str(interaction.user.id)
+        })
+        await interaction.response.send_message(
+            f"✅ Sorteio congelado cancelado. Semente revelada: `{pending['seed']}`",
+            ephemeral=True
+        )
+        return
+    
+    if acao == "congelar":
+        if pending:
+            await interaction.response.send_message(
+                "❌ Já existe um sorteio congelado. Realize ou cancele antes de congelar outro.",
+                ephemeral=True
+            )
+            return
+        if entropia:
+            await interaction.response.send_message(
+                "❌ No congelamento informe só a `fonte_entropia`; o resultado dela vai em `entropia` ao realizar.",
+                ephemeral=True
+            )
+            return
+        participants = db.get_all_participants()
+        if not participants:
+            await interaction.response.send_message(
+                "📋 Nenhum participante inscrito ainda.",
+                ephemeral=True
+            )
+            return
+        
+        entropy_source = (fonte_entropia or "").strip()
+        # cópia tirada no event loop: as inscrições continuam alterando o dict durante o congelamento
+        items = list(participants.items())
+        await interaction.response.defer(thinking=True)
+        try:
+            state = await asyncio.to_thread(_freeze_draw, items, str(interaction.user.id), entropy_source)
+        except Exception as e:
+            logger.error(f"Erro ao congelar sorteio: {e}", exc_info=True)
+            await followup_send(interaction, f"❌ Não foi possível congelar o sorteio: {e}")
+            return
+        db.set_pending_draw(state)
+        
+        source_line = (
+            f"**Fonte de entropia**: {entropy_source} (o resultado dela entra na semente)\n"
+            if entropy_source else "**Fonte de entropia**: nenhuma\n"
+        )
+        await followup_send(
+            interaction,
+            "🧊 **Sorteio congelado!**\n"
+            f"**Participantes**: {state['participants']} | **Fichas**: {state['total_tickets']}\n"
+            f"**SHA-256 do snapshot**: `{state['snapshot_sha256']}`\n"
+            f"**Compromisso da semente**: `{state['seed_sha256']}`\n"
+            + source_line +
+            "A semente será revelada junto com o resultado.",
+            file=discord.File(state["snapshot_file"], filename=os.path.basename(state["snapshot_file"]))
+        )
+        logger.info(f"Sorteio congelado por {interaction.user}: snapshot={state['snapshot_sha256']}")
+        return
+    
+    # realizar
+    if not pending:
+        await interaction.response.send_message(
+            "❌ Nenhum sorteio congelado. Use `/sortear acao:congelar` primeiro.",
+            ephemeral=True
+        )
+        return
+    if quantidade is None or quantidade <= 0:
+        await interaction.response.send_message(
+            "❌ A quantidade deve ser maior que 0!",
+            ephemeral=True
+        )
+        return
+    
+    # a entropia só vale se a fonte foi declarada no congelamento, e nesse caso é obrigatória
+    entropy_source = pending.get("entropy_source", "")
+    entropy = sorteio.normalize_entropy(entropia)
+    if entropy_source and not entropy:
+        await interaction.response.send_message(
+            f"❌ Informe em `entropia` o resultado da fonte declarada: {entropy_source}",
+            ephemeral=True
+        )
+        return
+    if entropy and not entropy_source:
+        await interaction.response.send_message(
+            "❌ Nenhuma fonte de entropia foi declarada no congelamento; realize sem `entropia`.",
+            ephemeral=True
+        )
+        return
+    if fonte_entropia and fonte_entropia.strip() != entropy_source:
+        await interaction.response.send_message(
+            "❌ A `fonte_entropia` não confere com a declarada no congelamento.",
+            ephemeral=True
+        )
+        return
+    
+    await interaction.response.defer(thinking=True)
+    try:
+        results = await asyncio.to_thread(
+            _run_frozen_draw, pending, quantidade, entropy, str(interaction.user.id)
+        )
+    except (OSError, ValueError) as e:
+        logger.error(f"Erro ao realizar sorteio congelado: {e}")
+        await followup_send(interaction, f"❌ Não foi possível realizar o sorteio: {e}")
+        return
+    db.set_pending_draw(None)
+    
+    participants = db.get_all_participants()
+    lines = [
+        "🎉 **Resultado do Sorteio**",
+        f"**Participantes**: {pending['participants']} | **Fichas**: {pending['total_tickets']}",
+        f"**SHA-256 do snapshot**: `{pending['snapshot_sha256']}`",
+        f"**Semente revelada**: `{pending['seed']}`",
+    ]
+    if entropy:
+        lines.append(f"**Entropia pública** ({entropy_source}): `{entropy}`")
+    verify = f"python sorteio.py {os.path.basename(pending['snapshot_file'])} {pending['seed']} {quantidade}"
+    if entropy:
+        verify += f" --entropia {entropy}"
+    lines.append(f"Verifique: `{verify}`")
+    lines.append("")
+    for result in results:
+        data = participants.get(result["user_id"], {})
+        name = f"{data.get('first_name', '')} {data.get('last_name', '')}".strip()
+        lines.append(
+            f"{result['position']}º — <@{result['user_id']}> {name} "
+            f"({result['tickets']} ficha(s), ficha nº {result['ticket'] + 1}/{result['pool_total']})"
+        )
+    
+    await followup_send(
+        interaction,
+        "\n".join(lines)[:2000],
+        file=discord.File(pending["snapshot_file"], filename=os.path.basename(pending["snapshot_file"]))
+    )
+    logger.info(f"Sorteio realizado por {interaction.user}: snapshot={pending['snapshot_sha256']}, "
+                f"ganhadores={[r['user_id'] for r in results]}")
+
 @bot.tree.command(name="blacklist", description="[ADMIN] Gerencia a blacklist")
 @app_commands.guild_only()
 @admin_or_mod_check()  # <-- ADICIONE ESTA LINHA
@@ -843,6 +1837,7 @@ async def estatisticas(interaction: discord.Interaction):
     usuario="Usuário para banir/desbanir",
     motivo="Motivo do banimento"
 )
+@metrics.profiled("command:blacklist")
 async def blacklist(
     interaction: discord.Interaction,
     acao: Literal["banir", "desbanir", "lista"],
@@ -866,20 +1861,25 @@ async def blacklist(
             )
             return
         
-        embed = discord.Embed(
-            title="🚫 Blacklist",
-            color=discord.Color.red()
-        )
+        entries = list(blacklist_data.items())
+        per_page = 10
         
-        for user_id, data in blacklist_data.items():
-            user = await bot.fetch_user(int(user_id))
-            embed.add_field(
-                name=f"{user.name}",
-                value=f"**Motivo**: {data['reason']}\n**Banido por**: <@{data['banned_by']}>",
-                inline=False
+        async def render(page: int) -> discord.Embed:
+            chunk = entries[page * per_page:(page + 1) * per_page]
+            names = await resolve_user_names(interaction.guild, [user_id for user_id, _ in chunk])
+            embed = discord.Embed(
+                title=f"🚫 Blacklist ({len(entries)})",
+                color=discord.Color.red()
             )
+            for user_id, data in chunk:
+                embed.add_field(
+                    name=names.get(int(user_id), f"ID {user_id}"),
+                    value=f"**Motivo**: {data['reason'][:500]}\n**Banido por**: <@{data['banned_by']}>",
+                    inline=False
+                )
+            return embed
         
-        await interaction.response.send_message(embed=embed, ephemeral=True)
+        await send_paginated_embed(interaction, -(-len(entries) // per_page), render)
         return
     
     if not usuario:
@@ -899,7 +1899,7 @@ async def blacklist(
                     channel = interaction.guild.get_channel(db.get_inscricao_channel())
                     if channel:
                         msg = await channel.fetch_message(participant["message_id"])
-                        await msg.delete()
+                        await message_delete(msg, priority=outbound.PRIORITY_ANNOUNCEMENT)
                 except:
                     pass
             
@@ -933,6 +1933,7 @@ async def blacklist(
     acao="Ação a realizar",
     canal="Canal a ser bloqueado"
 )
+@metrics.profiled("command:chat")
 async def chat(
     interaction: discord.Interaction,
     acao: Literal["on", "off", "status"],
@@ -1000,6 +2001,7 @@ async def chat(
     cor="Cor do embed (nome ou hex)",
     imagem="Imagem ou vídeo opcional"
 )
+@metrics.profiled("command:anunciar")
 async def anunciar(
     interaction: discord.Interaction,
     canal: discord.TextChannel,
@@ -1035,14 +2037,15 @@ async def anunciar(
             if imagem and imagem.content_type.startswith("image"):
                 embed_obj.set_image(url=f"attachment://{imagem.filename}")
             
-            await canal.send(embed=embed_obj, files=files if files else None)
+            await channel_send(canal, embed=embed_obj, files=files if files else None)
         else:
             if files:
-                await canal.send(content=mensagem, files=files)
+                await channel_send(canal, content=mensagem, files=files)
             else:
-                await canal.send(content=mensagem)
+                await channel_send(canal, content=mensagem)
         
-        await interaction.followup.send(
+        await followup_send(
+            interaction,
             f"✅ Anúncio enviado em {canal.mention}!",
             ephemeral=True
         )
@@ -1051,7 +2054,8 @@ async def anunciar(
         
     except Exception as e:
         logger.error(f"Erro ao enviar anúncio: {e}", exc_info=True)
-        await interaction.followup.send(
+        await followup_send(
+            interaction,
             f"❌ Erro ao enviar anúncio: {str(e)}",
             ephemeral=True
         )
@@ -1063,6 +2067,7 @@ async def anunciar(
     acao="Ação a realizar",
     usuario="Usuário a adicionar/remover"
 )
+@metrics.profiled("command:controle_acesso")
 async def controle_acesso(
     interaction: discord.Interaction,
     acao: Literal["adicionar", "remover", "lista"],
@@ -1086,23 +2091,24 @@ async def controle_acesso(
             )
             return
         
-        embed = discord.Embed(
-            title="👮 Moderadores do Bot",
-            color=discord.Color.blue()
-        )
+        mod_ids = [int(mod_id) for mod_id in moderators]
+        per_page = 15
         
-        mod_list = []
-        for mod_id in moderators:
-            user = await bot.fetch_user(int(mod_id))
-            mod_list.append(f"{user.name} (ID: {user.id})")
-        
-        embed.add_field(
-            name="Moderadores",
-            value="\n".join(mod_list),
-            inline=False
-        )
+        async def render(page: int) -> discord.Embed:
+            chunk = mod_ids[page * per_page:(page + 1) * per_page]
+            names = await resolve_user_names(interaction.guild, chunk)
+            embed = discord.Embed(
+                title="👮 Moderadores do Bot",
+                color=discord.Color.blue()
+            )
+            embed.add_field(
+                name=f"Moderadores ({len(mod_ids)})",
+                value="\n".join(f"{names[mod_id]} (ID: {mod_id})" for mod_id in chunk),
+                inline=False
+            )
+            return embed
         
-        await interaction.response.send_message(embed=embed, ephemeral=True)
+        await send_paginated_embed(interaction, -(-len(mod_ids) // per_page), render)
         return
     
     if not usuario:
@@ -1155,6 +2161,7 @@ async def controle_acesso(
     usuario="Usuário que receberá a TAG",
     quantidade="Quantidade de fichas extras da TAG (padrão: 1)"
 )
+@metrics.profiled("command:tag_manual")
 async def tag_manual(
     interaction: discord.Interaction,
     usuario: discord.User,
@@ -1195,6 +2202,7 @@ async def tag_manual(
 @app_commands.guild_only()
 @admin_or_mod_check()  # <-- ADICIONE ESTA LINHA
 @app_commands.describe(guild_id="ID do servidor (opcional, vazio para global)")
+@metrics.profiled("command:sync")
 async def sync(interaction: discord.Interaction, guild_id: Optional[str] = None):
     if not is_admin_or_moderator(interaction):  # ✅ ADICIONE ISTO
         await interaction.response.send_message(
@@ -1209,13 +2217,15 @@ async def sync(interaction: discord.Interaction, guild_id: Optional[str] = None)
         if guild_id:
             guild = discord.Object(id=int(guild_id))
             synced = await bot.tree.sync(guild=guild)
-            await interaction.followup.send(
+            await followup_send(
+                interaction,
                 f"✅ Sincronizados {len(synced)} comandos no servidor {guild_id}",
                 ephemeral=True
             )
         else:
             synced = await bot.tree.sync()
-            await interaction.followup.send(
+            await followup_send(
+                interaction,
                 f"✅ Sincronizados {len(synced)} comandos globalmente",
                 ephemeral=True
             )
@@ -1224,7 +2234,8 @@ async def sync(interaction: discord.Interaction, guild_id: Optional[str] = None)
         
     except Exception as e:
         logger.error(f"Erro ao sincronizar: {e}", exc_info=True)
-        await interaction.followup.send(
+        await followup_send(
+            interaction,
             f"❌ Erro ao sincronizar: {str(e)}",
             ephemeral=True
         )
@@ -1274,9 +2285,9 @@ if __name__ == "__main__":
         logging.error("BOT_TOKEN não encontrado nas variáveis de ambiente")
         exit(1)
 
-    # inicia Flask em thread antes de iniciar o cliente/bot
-    Thread(target=run_flask, daemon=True).start()
-    logging.info(f"Flask server iniciado na porta {os.getenv('PORT', 5000)}")
+    # carrega o banco uma única vez; as leituras seguintes são servidas da memória
+    db.load()
+    logging.info(f"Database carregado: {len(db.get_all_participants())} participante(s)")
 
     try:
         # use o nome real da sua instância (bot.run(...) ou client.run(...))
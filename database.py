@@ -1,70 +1,458 @@
-import json
+import asyncio
+import atexit
+import functools
 import os
-from typing import Dict, List, Optional, Any
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Any, Set
 from datetime import datetime
 import logging
 
+import metrics
+from storage import JsonStorage, SqliteStorage, apply_op
+
 logger = logging.getLogger(__name__)
 
 DATABASE_FILE = "database.json"
+# "json" (snapshot + journal) ou "sqlite" (tabelas indexadas, migra o JSON na primeira carga)
+DATABASE_BACKEND = os.getenv("DATABASE_BACKEND", "json").strip().lower()
+DATABASE_SQLITE_FILE = os.getenv("DATABASE_SQLITE_FILE", "database.sqlite3")
 
-def load() -> Dict[str, Any]:
+# intervalo (segundos) usado para agrupar o fsync do journal e a compactação
+FLUSH_INTERVAL = float(os.getenv("DATABASE_FLUSH_INTERVAL", "1.0"))
+# quantidade de operações no journal que dispara a compactação no próximo flush
+COMPACT_EVERY = int(os.getenv("DATABASE_COMPACT_EVERY", "2000"))
+# snapshots anteriores mantidos como database.json.1 ... database.json.N
+SNAPSHOT_BACKUPS = int(os.getenv("DATABASE_BACKUPS", "3"))
+
+# banco residente em memória: lido do disco uma vez e servido a todas as leituras
+_db: Dict[str, Any] = {}
+_loaded = False
+_compact_requested = False
+_storage = None
+_lock = threading.RLock()
+_flush_timer: Optional[threading.Timer] = None
+# lotes enfileirados por _commit e lotes já escritos pela thread de I/O;
+# diferença > 0 depois de um flush = escritas que ainda vão precisar de fsync
+_batches_submitted = 0
+_batches_written = 0
+# thread única que executa toda escrita em disco, na ordem em que foi enfileirada
+_io_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="database-io")
+# índices derivados dos participantes, mantidos a cada operação aplicada:
+# nome completo normalizado -> IDs com esse nome
+_name_index: Dict[str, Set[str]] = {}
+# role_id -> IDs cujas fichas incluem o cargo
+_role_index: Dict[str, Set[str]] = {}
+# IDs com fichas de TAG automática
+_tag_index: Set[str] = set()
+# agregados do /estatisticas, somados/subtraídos junto com os índices
+_stats: Dict[str, int] = {"participants": 0, "tickets": 0, "with_tag": 0}
+# role_id -> [participantes, fichas, abreviação vista por último]
+_role_stats: Dict[str, List[Any]] = {}
+
+class ChatGuard(NamedTuple):
     """
-    Carrega o banco de dados JSON.
+    Snapshot imutável do bloqueio de chat usado pelo on_message.
+    """
+    channel_id: Optional[int]  # None quando o bloqueio está desligado
+    moderators: FrozenSet[int]
+
+# trocado por inteiro (nunca alterado) sempre que chat_lock ou moderators mudam
+_chat_guard = ChatGuard(None, frozenset())
+_CHAT_GUARD_KEYS = ("chat_lock", "moderators")
+
+def _default_data() -> Dict[str, Any]:
+    """
+    Estrutura inicial do banco de dados.
     
     Returns:
-        Dict com estrutura do banco de dados
+        Dict com todas as chaves padrão
     """
-    if not os.path.exists(DATABASE_FILE):
-        return {
-            "participants": {},
-            "bonus_roles": {},
-            "hashtag": {
-                "value": None,
-                "locked": False
-            },
-            "tag": {
-                "enabled": False,
-                "text": None,
-                "quantity": 1
-            },
-            "inscricao_channel": None,
-            # agora armazena lista de message_ids (retrocompatível com single)
-            "button_message_id": [],
-            "inscricoes_closed": False,
-            "blacklist": {},
-            "chat_lock": {
-                "enabled": False,
-                "channel_id": None
-            },
-            "moderators": []
-        }
+    return {
+        "participants": {},
+        "bonus_roles": {},
+        "hashtag": {
+            "value": None,
+            "locked": False
+        },
+        "tag": {
+            "enabled": False,
+            "text": None,
+            "quantity": 1
+        },
+        "inscricao_channel": None,
+        # agora armazena lista de message_ids (retrocompatível com single)
+        "button_message_id": [],
+        "inscricoes_closed": False,
+        "blacklist": {},
+        "chat_lock": {
+            "enabled": False,
+            "channel_id": None
+        },
+        "moderators": []
+    }
+
+def _init_db() -> None:
+    """
+    Garante que o banco em memória possui todas as chaves padrão.
+    """
+    for key, value in _default_data().items():
+        _db.setdefault(key, value)
+
+def _mutator(func):
+    """
+    Serializa a função com o lock do banco, evitando que um flush em segundo
+    plano grave o dicionário no meio de uma alteração.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _lock:
+            return func(*args, **kwargs)
+    return wrapper
+
+def _op_set(path: List[str], value: Any) -> Dict[str, Any]:
+    return {"op": "set", "path": path, "value": value}
+
+def _op_del(path: List[str]) -> Dict[str, Any]:
+    return {"op": "del", "path": path}
+
+def _normalize_name(first_name: str, last_name: str) -> str:
+    """
+    Chave do índice de nomes: nome completo em casefold, com espaços colapsados.
+    """
+    return " ".join(f"{first_name or ''} {last_name or ''}".split()).casefold()
+
+def _participant_scope(op: Dict[str, Any]) -> Optional[str]:
+    """
+    Participante afetado por uma operação: o ID, "" se a operação não mexe em
+    participantes ou None se mexe na tabela inteira.
+    """
+    path = op.get("path") or []
+    if not path or (path[0] == "participants" and len(path) == 1):
+        return None
+    if path[0] == "participants":
+        return path[1]
+    return ""
+
+def _as_int(value: Any) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+def _count_stats(tickets: Dict[str, Any], sign: int) -> None:
+    # soma (sign=1) ou subtrai (sign=-1) a contribuição de um participante nos agregados
+    tag_amount = _as_int(tickets.get("tag"))
+    manual = _as_int(tickets.get("manual_tag"))
+    total = _as_int(tickets.get("base", 1)) + max(0, tag_amount) + max(0, manual)
+    for role_id, role_data in (tickets.get("roles") or {}).items():
+        quantity = _as_int(role_data.get("quantity"))
+        total += quantity
+        entry = _role_stats.get(role_id)
+        if entry is None:
+            entry = _role_stats[role_id] = [0, 0, "?"]
+        entry[0] += sign
+        entry[1] += sign * quantity
+        if sign > 0:
+            entry[2] = role_data.get("abbreviation", "?")
+        elif entry[0] <= 0:
+            del _role_stats[role_id]
+    _stats["participants"] += sign
+    _stats["tickets"] += sign * total
+    if tag_amount > 0 or manual > 0:
+        _stats["with_tag"] += sign
+
+def _unindex_participant(user_id: str) -> None:
+    participant = _db["participants"].get(user_id)
+    if not participant:
+        return
+    _count_stats(participant.get("tickets") or {}, -1)
+    key = _normalize_name(participant.get("first_name"), participant.get("last_name"))
+    owners = _name_index.get(key)
+    if owners is not None:
+        owners.discard(user_id)
+        if not owners:
+            del _name_index[key]
+    tickets = participant.get("tickets") or {}
+    for role_id in tickets.get("roles") or {}:
+        holders = _role_index.get(role_id)
+        if holders is not None:
+            holders.discard(user_id)
+            if not holders:
+                del _role_index[role_id]
+    _tag_index.discard(user_id)
+
+def _index_participant(user_id: str) -> None:
+    participant = _db["participants"].get(user_id)
+    if not participant:
+        return
+    key = _normalize_name(participant.get("first_name"), participant.get("last_name"))
+    _name_index.setdefault(key, set()).add(user_id)
+    tickets = participant.get("tickets") or {}
+    _count_stats(tickets, 1)
+    for role_id in tickets.get("roles") or {}:
+        _role_index.setdefault(role_id, set()).add(user_id)
+    if tickets.get("tag"):
+        _tag_index.add(user_id)
+
+def _rebuild_indexes() -> None:
+    """
+    Reconstrói os índices derivados a partir dos participantes em memória.
+    """
+    _name_index.clear()
+    _role_index.clear()
+    _tag_index.clear()
+    _role_stats.clear()
+    for key in _stats:
+        _stats[key] = 0
+    for user_id in _db.get("participants", {}):
+        _index_participant(user_id)
+    _refresh_chat_guard()
+
+def _refresh_chat_guard() -> None:
+    global _chat_guard
+    chat_lock = _db.get("chat_lock") or {}
+    channel_id = chat_lock.get("channel_id") if chat_lock.get("enabled") else None
+    moderators = set()
+    for mod_id in _db.get("moderators", []):
+        try:
+            moderators.add(int(mod_id))
+        except (TypeError, ValueError):
+            pass
+    _chat_guard = ChatGuard(int(channel_id) if channel_id else None, frozenset(moderators))
+
+def _apply(op: Dict[str, Any]) -> None:
+    # aplica a operação mantendo os índices derivados em dia
+    scope = _participant_scope(op)
+    if scope:
+        _unindex_participant(scope)
+    apply_op(_db, op)
+    if scope is None:
+        _rebuild_indexes()
+    elif scope:
+        _index_participant(scope)
+    elif op["path"][0] in _CHAT_GUARD_KEYS:
+        _refresh_chat_guard()
+
+def _submit_io(func, *args) -> Future:
+    """
+    Enfileira uma tarefa de disco na thread de I/O do banco.
     
+    Durante o encerramento do interpretador o executor já não aceita tarefas;
+    nesse caso a tarefa roda na thread atual.
+    """
+    try:
+        return _io_executor.submit(func, *args)
+    except RuntimeError:
+        future: Future = Future()
+        try:
+            future.set_result(func(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+def _schedule_flush() -> None:
+    global _flush_timer
+    if _flush_timer is None:
+        _flush_timer = threading.Timer(FLUSH_INTERVAL, _submit_io, args=(_flush,))
+        _flush_timer.daemon = True
+        _flush_timer.start()
+
+def _write_batch(batch: Any) -> None:
+    global _compact_requested, _batches_written
     try:
-        with open(DATABASE_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        _storage.write(batch)
     except Exception as e:
-        logger.error(f"Erro ao carregar database: {e}")
-        return load()
+        logger.error(f"Erro ao gravar alterações no database: {e}")
+        with _lock:
+            # garante que o estado chegue ao disco pelo snapshot
+            _compact_requested = True
+            _schedule_flush()
+    finally:
+        _batches_written += 1
+
+def _create_storage():
+    if DATABASE_BACKEND == "sqlite":
+        return SqliteStorage(DATABASE_SQLITE_FILE, migrate_from=DATABASE_FILE)
+    if DATABASE_BACKEND != "json":
+        logger.warning(f"DATABASE_BACKEND desconhecido '{DATABASE_BACKEND}', usando json")
+    return JsonStorage(DATABASE_FILE, backups=SNAPSHOT_BACKUPS)
 
-def save(data: Dict[str, Any]) -> bool:
+def _commit(*ops: Dict[str, Any]) -> bool:
     """
-    Salva o banco de dados JSON.
+    Aplica operações no banco em memória e enfileira a gravação.
+    
+    Só a serialização das operações roda na thread chamadora (o loop do bot);
+    a escrita em disco acontece na thread de I/O. O custo é proporcional ao
+    tamanho das operações, não do banco.
     
     Args:
-        data: Dicionário com os dados a serem salvos
+        ops: Operações criadas com _op_set/_op_del
         
     Returns:
-        True se salvou com sucesso, False caso contrário
+        True se as operações foram aplicadas e enfileiradas
+    """
+    global _compact_requested, _batches_submitted
+    with _lock:
+        load()
+        for op in ops:
+            _apply(op)
+        try:
+            batch = _storage.prepare(list(ops), _db)
+        except Exception as e:
+            logger.error(f"Erro ao serializar alterações no database: {e}")
+            _compact_requested = True
+            _schedule_flush()
+            return False
+        _batches_submitted += 1
+        _submit_io(_write_batch, batch)
+        _schedule_flush()
+    return True
+
+def load() -> Dict[str, Any]:
+    """
+    Retorna o banco de dados residente em memória.
+    
+    Apenas a primeira chamada lê o armazenamento (JSON + journal ou SQLite,
+    conforme DATABASE_BACKEND); as seguintes devolvem o mesmo dicionário.
+    Os valores retornados são referências ao estado interno e não devem ser
+    alterados fora das funções deste módulo.
+    
+    Returns:
+        Dict com estrutura do banco de dados
+    """
+    global _loaded, _storage
+    if not _loaded:
+        with _lock:
+            if not _loaded:
+                try:
+                    storage = _create_storage()
+                    data = storage.load(_default_data)
+                except Exception as e:
+                    # não inicia com banco vazio: a próxima compactação sobrescreveria o arquivo
+                    logger.error(f"Erro ao carregar database: {e}")
+                    raise
+                _db.clear()
+                _db.update(data)
+                _init_db()
+                _rebuild_indexes()
+                _storage = storage
+                _loaded = True
+    return _db
+
+def is_loaded() -> bool:
+    """
+    Verifica se o banco já foi carregado do armazenamento.
+    
+    Returns:
+        True se load() já concluiu com sucesso
+    """
+    return _loaded
+
+def save(data: Optional[Dict[str, Any]] = None) -> bool:
     """
+    Agenda a gravação completa do banco (snapshot).
+    
+    As funções deste módulo registram suas alterações no journal e não precisam
+    chamar save(); ela existe para quem altera o dicionário de load() diretamente.
+    
+    Args:
+        data: Dicionário com os dados (substitui o estado em memória se for
+              outro objeto que não o retornado por load())
+        
+    Returns:
+        True se a gravação foi agendada
+    """
+    global _compact_requested
+    with _lock:
+        load()
+        if data is not None and data is not _db:
+            return _commit(_op_set([], data))
+        # o dicionário foi alterado por fora: índices e snapshot precisam ser refeitos
+        _rebuild_indexes()
+        _compact_requested = True
+        _schedule_flush()
+    return True
+
+def _snapshot_copy() -> Dict[str, Any]:
+    # cópia rasa em dois níveis: tabelas e configurações são copiadas; as
+    # entidades dentro delas nunca são alteradas no lugar (ver apply_op)
+    return {
+        key: dict(value) if isinstance(value, dict) else list(value) if isinstance(value, list) else value
+        for key, value in _db.items()
+    }
+
+def _flush(compact: bool = False) -> bool:
+    # roda sempre na thread de I/O: todas as escritas enfileiradas antes já
+    # foram feitas, e as novas só rodam depois deste flush. O lock fica só
+    # com a cópia do banco; fsync, troca do journal e serialização vêm depois
+    global _flush_timer, _compact_requested
+    if not _loaded:
+        return True
+    with _lock:
+        if _flush_timer is not None:
+            _flush_timer.cancel()
+            _flush_timer = None
+        compact = compact or _compact_requested or _storage.journal_records >= COMPACT_EVERY
+        full = _compact_requested
+        data = _snapshot_copy() if compact else None
+        if compact:
+            _compact_requested = False
     try:
-        with open(DATABASE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
+        start = time.perf_counter()
+        if compact:
+            _storage.finish_compaction(_storage.begin_compaction(data, full=full))
+        else:
+            _storage.sync()
+        metrics.histogram("db_flush_seconds", "compact" if compact else "sync").observe(time.perf_counter() - start)
+        with _lock:
+            # commits entre o disparo do timer e este flush não criaram timer
+            # novo e seus lotes ainda estão na fila atrás deste flush
+            if _batches_submitted > _batches_written:
+                _schedule_flush()
         return True
     except Exception as e:
+        metrics.inc("db_flush_errors_total")
         logger.error(f"Erro ao salvar database: {e}")
+        with _lock:
+            # o journal congelado continua no disco; tenta de novo em seguida
+            if compact:
+                _compact_requested = True
+            _schedule_flush()
         return False
 
+def flush(compact: bool = False) -> bool:
+    """
+    Força o journal para o disco e, quando necessário, compacta em um snapshot.
+    
+    A compactação acontece se solicitada, se save() foi chamada ou se o journal
+    passou de COMPACT_EVERY operações. Bloqueia até a thread de I/O terminar;
+    dentro do loop do bot use flush_async().
+    
+    Args:
+        compact: True para reescrever o snapshot e zerar o journal
+        
+    Returns:
+        True se gravou com sucesso, False caso contrário
+    """
+    return _submit_io(_flush, compact).result()
+
+async def flush_async(compact: bool = False) -> bool:
+    """
+    Versão assíncrona de flush(): aguarda a thread de I/O sem bloquear o loop.
+    
+    Args:
+        compact: True para reescrever o snapshot e zerar o journal
+        
+    Returns:
+        True se gravou com sucesso, False caso contrário
+    """
+    return await asyncio.wrap_future(_submit_io(_flush, compact))
+
+atexit.register(flush, True)
+
+@_mutator
 def add_participant(user_id: int, first_name: str, last_name: str, 
                    tickets: Dict[str, Any], message_id: Optional[int] = None) -> bool:
     """
@@ -80,20 +468,36 @@ def add_participant(user_id: int, first_name: str, last_name: str,
     Returns:
         True se adicionou com sucesso
     """
-    data = load()
     # garante estrutura mínima de tickets
     tickets = tickets or {}
     if "base" not in tickets:
         tickets.setdefault("base", 1)
-    data["participants"][str(user_id)] = {
+    return _commit(_op_set(["participants", str(user_id)], {
         "first_name": first_name,
         "last_name": last_name,
         "tickets": tickets,
         "message_id": message_id,
         "timestamp": datetime.now().isoformat()
-    }
-    return save(data)
+    }))
+
+@_mutator
+def set_participant_message(user_id: int, message_id: Optional[int]) -> bool:
+    """
+    Define a mensagem de inscrição de um participante já registrado.
+    
+    Args:
+        user_id: ID do usuário Discord
+        message_id: ID da mensagem no canal de inscrições
+        
+    Returns:
+        True se atualizou, False se o usuário não está inscrito
+    """
+    data = load()
+    if str(user_id) not in data["participants"]:
+        return False
+    return _commit(_op_set(["participants", str(user_id), "message_id"], message_id))
 
+@_mutator
 def remove_participant(user_id: int) -> bool:
     """
     Remove um participante do banco de dados.
@@ -106,8 +510,7 @@ def remove_participant(user_id: int) -> bool:
     """
     data = load()
     if str(user_id) in data["participants"]:
-        del data["participants"][str(user_id)]
-        return save(data)
+        return _commit(_op_del(["participants", str(user_id)]))
     return False
 
 def get_participant(user_id: int) -> Optional[Dict[str, Any]]:
@@ -150,6 +553,8 @@ def is_name_taken(first_name: str, last_name: str, exclude_user_id: Optional[int
     """
     Verifica se um nome completo já foi registrado.
     
+    Consulta o índice de nomes (casefold, espaços colapsados) em O(1).
+    
     Args:
         first_name: Primeiro nome
         last_name: Sobrenome
@@ -158,15 +563,38 @@ def is_name_taken(first_name: str, last_name: str, exclude_user_id: Optional[int
     Returns:
         True se o nome já está em uso
     """
-    data = load()
-    for user_id, participant in data["participants"].items():
-        if exclude_user_id and str(exclude_user_id) == user_id:
-            continue
-        if (participant["first_name"].lower() == first_name.lower() and 
-            participant["last_name"].lower() == last_name.lower()):
-            return True
-    return False
+    load()
+    owners = _name_index.get(_normalize_name(first_name, last_name))
+    if not owners:
+        return False
+    if exclude_user_id:
+        return any(user_id != str(exclude_user_id) for user_id in owners)
+    return True
 
+def get_participants_with_role(role_id: int) -> List[str]:
+    """
+    Obtém os participantes cujas fichas incluem um cargo bônus.
+    
+    Args:
+        role_id: ID do cargo
+        
+    Returns:
+        Lista de IDs de usuário (consulta ao índice, sem varrer participantes)
+    """
+    load()
+    return list(_role_index.get(str(role_id), ()))
+
+def get_participants_with_tag() -> List[str]:
+    """
+    Obtém os participantes que recebem fichas da TAG automática.
+    
+    Returns:
+        Lista de IDs de usuário
+    """
+    load()
+    return list(_tag_index)
+
+@_mutator
 def add_bonus_role(role_id: int, quantity: int, abbreviation: str) -> bool:
     """
     Adiciona um cargo bônus.
@@ -179,13 +607,12 @@ def add_bonus_role(role_id: int, quantity: int, abbreviation: str) -> bool:
     Returns:
         True se adicionou com sucesso
     """
-    data = load()
-    data["bonus_roles"][str(role_id)] = {
+    return _commit(_op_set(["bonus_roles", str(role_id)], {
         "quantity": quantity,
         "abbreviation": abbreviation
-    }
-    return save(data)
+    }))
 
+@_mutator
 def remove_bonus_role(role_id: int) -> bool:
     """
     Remove um cargo bônus.
@@ -198,8 +625,7 @@ def remove_bonus_role(role_id: int) -> bool:
     """
     data = load()
     if str(role_id) in data["bonus_roles"]:
-        del data["bonus_roles"][str(role_id)]
-        return save(data)
+        return _commit(_op_del(["bonus_roles", str(role_id)]))
     return False
 
 def get_bonus_roles() -> Dict[str, Any]:
@@ -212,6 +638,7 @@ def get_bonus_roles() -> Dict[str, Any]:
     data = load()
     return data["bonus_roles"]
 
+@_mutator
 def set_hashtag(hashtag: str, locked: bool = False) -> bool:
     """
     Define a hashtag obrigatória.
@@ -226,10 +653,12 @@ def set_hashtag(hashtag: str, locked: bool = False) -> bool:
     data = load()
     if data["hashtag"]["locked"] and not locked:
         return False
-    data["hashtag"]["value"] = hashtag
-    data["hashtag"]["locked"] = locked
-    return save(data)
+    return _commit(_op_set(["hashtag"], {
+        "value": hashtag,
+        "locked": locked
+    }))
 
+@_mutator
 def lock_hashtag(locked: bool = True) -> bool:
     """
     Bloqueia/desbloqueia a hashtag.
@@ -240,9 +669,7 @@ def lock_hashtag(locked: bool = True) -> bool:
     Returns:
         True se atualizou com sucesso
     """
-    data = load()
-    data["hashtag"]["locked"] = locked
-    return save(data)
+    return _commit(_op_set(["hashtag", "locked"], locked))
 
 def get_hashtag() -> Optional[str]:
     """
@@ -264,6 +691,7 @@ def is_hashtag_locked() -> bool:
     data = load()
     return data["hashtag"]["locked"]
 
+@_mutator
 def set_tag(enabled: bool, text: Optional[str] = None, quantity: int = 1) -> bool:
     """
     Configura a tag do servidor.
@@ -277,11 +705,12 @@ def set_tag(enabled: bool, text: Optional[str] = None, quantity: int = 1) -> boo
         True se configurou com sucesso
     """
     data = load()
-    data["tag"]["enabled"] = enabled
+    tag = dict(data["tag"])
+    tag["enabled"] = enabled
     if text is not None:
-        data["tag"]["text"] = text
-    data["tag"]["quantity"] = quantity
-    return save(data)
+        tag["text"] = text
+    tag["quantity"] = quantity
+    return _commit(_op_set(["tag"], tag))
 
 def get_tag() -> Dict[str, Any]:
     """
@@ -293,6 +722,7 @@ def get_tag() -> Dict[str, Any]:
     data = load()
     return data["tag"]
 
+@_mutator
 def set_inscricao_channel(channel_id: Optional[int]) -> bool:
     """
     Define o canal de inscrições.
@@ -303,9 +733,7 @@ def set_inscricao_channel(channel_id: Optional[int]) -> bool:
     Returns:
         True se definiu com sucesso
     """
-    data = load()
-    data["inscricao_channel"] = channel_id
-    return save(data)
+    return _commit(_op_set(["inscricao_channel"], channel_id))
 
 def get_inscricao_channel() -> Optional[int]:
     """
@@ -318,6 +746,7 @@ def get_inscricao_channel() -> Optional[int]:
     return data["inscricao_channel"]
 
 # button message helpers (suporta múltiplos IDs)
+@_mutator
 def add_button_message_id(message_id: int) -> bool:
     """
     Adiciona um ID de mensagem à lista de mensagens do botão de inscrição.
@@ -333,11 +762,12 @@ def add_button_message_id(message_id: int) -> bool:
     if not isinstance(mids, list):
         # compatibilidade: transforma single em lista
         mids = [mids] if mids else []
+    mids = list(mids)
     if str(message_id) not in [str(x) for x in mids]:
         mids.append(int(message_id))
-    data["button_message_id"] = mids
-    return save(data)
+    return _commit(_op_set(["button_message_id"], mids))
 
+@_mutator
 def set_button_message_id(message_id: Optional[int]) -> bool:
     """
     Define o ID da mensagem com o botão de inscrição.
@@ -348,9 +778,7 @@ def set_button_message_id(message_id: Optional[int]) -> bool:
     Returns:
         True se definiu com sucesso
     """
-    data = load()
-    data["button_message_id"] = message_id
-    return save(data)
+    return _commit(_op_set(["button_message_id"], message_id))
 
 def get_button_message_id() -> Any:
     """
@@ -362,6 +790,7 @@ def get_button_message_id() -> Any:
     data = load()
     return data.get("button_message_id")
 
+@_mutator
 def set_inscricoes_closed(enabled: bool) -> bool:
     """
     Define se as inscrições estão fechadas.
@@ -372,9 +801,7 @@ def set_inscricoes_closed(enabled: bool) -> bool:
     Returns:
         True se atualizou com sucesso
     """
-    data = load()
-    data["inscricoes_closed"] = bool(enabled)
-    return save(data)
+    return _commit(_op_set(["inscricoes_closed"], bool(enabled)))
 
 def get_inscricoes_closed() -> bool:
     """
@@ -386,6 +813,7 @@ def get_inscricoes_closed() -> bool:
     data = load()
     return bool(data.get("inscricoes_closed", False))
 
+@_mutator
 def add_to_blacklist(user_id: int, reason: str, banned_by: int) -> bool:
     """
     Adiciona um usuário à blacklist.
@@ -398,14 +826,13 @@ def add_to_blacklist(user_id: int, reason: str, banned_by: int) -> bool:
     Returns:
         True se adicionou com sucesso
     """
-    data = load()
-    data["blacklist"][str(user_id)] = {
+    return _commit(_op_set(["blacklist", str(user_id)], {
         "reason": reason,
         "banned_by": banned_by,
         "timestamp": datetime.now().isoformat()
-    }
-    return save(data)
+    }))
 
+@_mutator
 def remove_from_blacklist(user_id: int) -> bool:
     """
     Remove um usuário da blacklist.
@@ -418,8 +845,7 @@ def remove_from_blacklist(user_id: int) -> bool:
     """
     data = load()
     if str(user_id) in data["blacklist"]:
-        del data["blacklist"][str(user_id)]
-        return save(data)
+        return _commit(_op_del(["blacklist", str(user_id)]))
     return False
 
 def get_blacklist() -> Dict[str, Any]:
@@ -445,6 +871,7 @@ def is_blacklisted(user_id: int) -> bool:
     data = load()
     return str(user_id) in data["blacklist"]
 
+@_mutator
 def set_chat_lock(enabled: bool, channel_id: Optional[int] = None) -> bool:
     """
     Configura o bloqueio de chat.
@@ -457,10 +884,11 @@ def set_chat_lock(enabled: bool, channel_id: Optional[int] = None) -> bool:
         True se configurou com sucesso
     """
     data = load()
-    data["chat_lock"]["enabled"] = enabled
+    chat_lock = dict(data["chat_lock"])
+    chat_lock["enabled"] = enabled
     if channel_id is not None:
-        data["chat_lock"]["channel_id"] = channel_id
-    return save(data)
+        chat_lock["channel_id"] = channel_id
+    return _commit(_op_set(["chat_lock"], chat_lock))
 
 def get_chat_lock() -> Dict[str, Any]:
     """
@@ -472,11 +900,23 @@ def get_chat_lock() -> Dict[str, Any]:
     data = load()
     return data["chat_lock"]
 
+def get_chat_guard() -> ChatGuard:
+    """
+    Obtém o snapshot do bloqueio de chat (canal bloqueado + IDs de moderadores).
+    
+    Returns:
+        ChatGuard imutável; basta comparar o canal e consultar o frozenset
+    """
+    load()
+    return _chat_guard
+
+@_mutator
 def clear_participants():
     """
     Limpa apenas os participantes do sorteio, preservando quaisquer TAGs manuais.
     Move manual_tag encontradas em participantes para _db['manual_tags'] antes de limpar.
     """
+    load()
     # garante estrutura
     manual_tags = _db.get("manual_tags", {}).copy() if isinstance(_db.get("manual_tags", {}), dict) else {}
 
@@ -490,14 +930,18 @@ def clear_participants():
             continue
 
     # persiste manual_tags e limpa participantes
+    ops = []
     if manual_tags:
-        _db["manual_tags"] = manual_tags
-    _db["participants"] = {}
+        ops.append(_op_set(["manual_tags"], manual_tags))
+    ops.append(_op_set(["participants"], {}))
+    _commit(*ops)
 
+@_mutator
 def clear_all():
     """
     Reseta o DB mantendo somente as TAGs manuais (se existirem).
     """
+    load()
     # coleta manual_tags atuais e também dos participantes (por segurança)
     manual_tags = _db.get("manual_tags", {}).copy() if isinstance(_db.get("manual_tags", {}), dict) else {}
 
@@ -509,22 +953,16 @@ def clear_all():
         except Exception:
             continue
 
-    # limpa tudo e inicializa defaults
-    _db.clear()
-    _init_db()
-
-    # restaura manual_tags se houver
+    # limpa tudo e inicializa defaults, restaurando manual_tags se houver
+    data = _default_data()
     if manual_tags:
-        _db["manual_tags"] = manual_tags
+        data["manual_tags"] = manual_tags
+    _commit(_op_set([], data))
 
-def get_statistics() -> Dict[str, Any]:
+def _compute_statistics(data: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Obtém estatísticas do banco de dados.
-    
-    Returns:
-        Dict com estatísticas
+    Calcula as estatísticas percorrendo todos os participantes (usado para conferir os agregados).
     """
-    data = load()
     participants = data["participants"]
     
     total_participants = len(participants)
@@ -573,6 +1011,61 @@ def get_statistics() -> Dict[str, Any]:
         "blacklist_count": len(data.get("blacklist", {}))
     }
 
+
+def get_statistics() -> Dict[str, Any]:
+    """
+    Obtém estatísticas do banco de dados a partir dos agregados mantidos em memória (O(cargos)).
+    
+    Returns:
+        Dict com estatísticas
+    """
+    data = load()
+    bonus_roles = data.get("bonus_roles", {})
+    with _lock:
+        tickets_by_role = {}
+        for role_id, (count, total, abbreviation) in _role_stats.items():
+            configured = bonus_roles.get(role_id)
+            tickets_by_role[role_id] = {
+                "count": count,
+                "total_tickets": total,
+                "abbreviation": configured.get("abbreviation", abbreviation) if configured else abbreviation
+            }
+        return {
+            "total_participants": _stats["participants"],
+            "total_tickets": _stats["tickets"],
+            "tickets_by_role": tickets_by_role,
+            "participants_with_tag": _stats["with_tag"],
+            "blacklist_count": len(data.get("blacklist", {}))
+        }
+
+def verify_statistics(repair: bool = True) -> bool:
+    """
+    Confere os agregados contra um recálculo completo.
+    
+    Args:
+        repair: Reconstrói índices e agregados se houver divergência
+        
+    Returns:
+        True se os agregados estavam corretos
+    """
+    data = load()
+    with _lock:
+        expected = _compute_statistics(data)
+        current = get_statistics()
+        strip = lambda roles: {rid: (r["count"], r["total_tickets"]) for rid, r in roles.items()}
+        ok = (
+            current["total_participants"] == expected["total_participants"]
+            and current["total_tickets"] == expected["total_tickets"]
+            and current["participants_with_tag"] == expected["participants_with_tag"]
+            and strip(current["tickets_by_role"]) == strip(expected["tickets_by_role"])
+        )
+        if not ok:
+            logger.warning(f"Agregados de estatísticas divergentes: {current} != {expected}")
+            if repair:
+                _rebuild_indexes()
+        return ok
+
+@_mutator
 def update_tickets(user_id: int, tickets: Dict[str, Any]) -> bool:
     """
     Atualiza as fichas de um participante.
@@ -586,10 +1079,91 @@ def update_tickets(user_id: int, tickets: Dict[str, Any]) -> bool:
     """
     data = load()
     if str(user_id) in data["participants"]:
-        data["participants"][str(user_id)]["tickets"] = tickets
-        return save(data)
+        return _commit(_op_set(["participants", str(user_id), "tickets"], tickets))
     return False
 
+@_mutator
+def update_tickets_bulk(tickets_by_user: Dict[Any, Dict[str, Any]]) -> int:
+    """
+    Atualiza as fichas de vários participantes em uma única gravação.
+    
+    Participantes inexistentes ou com fichas iguais às atuais são ignorados;
+    os demais vão em um único lote (um append no journal / uma transação no SQLite).
+    
+    Args:
+        tickets_by_user: Dict user_id -> novo dicionário de fichas
+        
+    Returns:
+        Quantidade de participantes cujas fichas mudaram
+    """
+    data = load()
+    ops = []
+    for user_id, tickets in tickets_by_user.items():
+        participant = data["participants"].get(str(user_id))
+        if participant is None or participant.get("tickets") == tickets:
+            continue
+        ops.append(_op_set(["participants", str(user_id), "tickets"], tickets))
+    if ops:
+        _commit(*ops)
+    return len(ops)
+
+@_mutator
+def set_recalc_checkpoint(state: Optional[Dict[str, Any]]) -> bool:
+    """
+    Salva o progresso do recálculo de fichas em andamento (/atualizar).
+    
+    Args:
+        state: Dicionário com cursor e contadores, ou None para remover
+        
+    Returns:
+        True se salvou com sucesso
+    """
+    data = load()
+    if state is None:
+        if "recalc_job" in data:
+            return _commit(_op_del(["recalc_job"]))
+        return True
+    return _commit(_op_set(["recalc_job"], dict(state)))
+
+def get_recalc_checkpoint() -> Optional[Dict[str, Any]]:
+    """
+    Obtém o progresso salvo do recálculo de fichas.
+    
+    Returns:
+        Dict com cursor e contadores ou None se não houver recálculo pendente
+    """
+    data = load()
+    return data.get("recalc_job")
+
+@_mutator
+def set_pending_draw(state: Optional[Dict[str, Any]]) -> bool:
+    """
+    Salva o sorteio congelado aguardando realização (/sortear).
+    
+    Args:
+        state: Dicionário com hashes, semente e arquivo do snapshot, ou None para remover
+        
+    Returns:
+        True se salvou com sucesso
+    """
+    data = load()
+    if state is None:
+        if "draw_pending" in data:
+            return _commit(_op_del(["draw_pending"]))
+        return True
+    return _commit(_op_set(["draw_pending"], dict(state)))
+
+def get_pending_draw() -> Optional[Dict[str, Any]]:
+    """
+    Obtém o sorteio congelado aguardando realização.
+    
+    Returns:
+        Dict do sorteio congelado ou None
+    """
+    data = load()
+    return data.get("draw_pending")
+
+@_mutator
 def add_moderator(user_id: int) -> bool:
     """
     Adiciona um moderador.
@@ -601,13 +1175,12 @@ def add_moderator(user_id: int) -> bool:
         True se adicionou com sucesso
     """
     data = load()
-    if "moderators" not in data:
-        data["moderators"] = []
-    if str(user_id) not in data["moderators"]:
-        data["moderators"].append(str(user_id))
-        return save(data)
+    moderators = data.get("moderators", [])
+    if str(user_id) not in moderators:
+        return _commit(_op_set(["moderators"], moderators + [str(user_id)]))
     return False
 
+@_mutator
 def remove_moderator(user_id: int) -> bool:
     """
     Remove um moderador.
@@ -619,11 +1192,9 @@ def remove_moderator(user_id: int) -> bool:
         True se removeu com sucesso
     """
     data = load()
-    if "moderators" not in data:
-        data["moderators"] = []
-    if str(user_id) in data["moderators"]:
-        data["moderators"].remove(str(user_id))
-        return save(data)
+    moderators = data.get("moderators", [])
+    if str(user_id) in moderators:
+        return _commit(_op_set(["moderators"], [m for m in moderators if m != str(user_id)]))
     return False
 
 def get_moderators() -> List[str]:
@@ -646,10 +1217,11 @@ def is_moderator(user_id: int) -> bool:
     Returns:
         True se é moderador
     """
-    data = load()
-    return str(user_id) in data.get("moderators", [])
+    load()
+    return int(user_id) in _chat_guard.moderators
 
 # MANUAL TAG helpers (guardam quantidade em tickets.manual_tag)
+@_mutator
 def set_manual_tag(user_id: int, quantity: int) -> bool:
     """
     Define fichas de TAG manual para um participante.
@@ -664,11 +1236,11 @@ def set_manual_tag(user_id: int, quantity: int) -> bool:
     data = load()
     if str(user_id) not in data["participants"]:
         return False
-    tickets = data["participants"][str(user_id)].get("tickets", {})
+    tickets = dict(data["participants"][str(user_id)].get("tickets", {}))
     tickets["manual_tag"] = int(quantity)
-    data["participants"][str(user_id)]["tickets"] = tickets
-    return save(data)
+    return _commit(_op_set(["participants", str(user_id), "tickets"], tickets))
 
+@_mutator
 def remove_manual_tag(user_id: int) -> bool:
     """
     Remove a TAG manual de um participante.
@@ -684,9 +1256,8 @@ def remove_manual_tag(user_id: int) -> bool:
         return False
     tickets = data["participants"][str(user_id)].get("tickets", {})
     if "manual_tag" in tickets:
-        del tickets["manual_tag"]
-    data["participants"][str(user_id)]["tickets"] = tickets
-    return save(data)
+        return _commit(_op_del(["participants", str(user_id), "tickets", "manual_tag"]))
+    return True
 
 def has_manual_tag(user_id: int) -> bool:
     """
@@ -0,0 +1,139 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import discord
+
+import outbound
+
+logger = logging.getLogger(__name__)
+
+# o Discord só aceita exclusão em massa de mensagens com menos de 14 dias;
+# a margem evita que a mensagem "envelheça" entre a checagem e a chamada
+BULK_DELETE_MAX_AGE = timedelta(days=14) - timedelta(minutes=10)
+BULK_DELETE_LIMIT = 100
+
+class DeletionQueue:
+    """
+    Fila de exclusão por canal para o chat bloqueado.
+
+    As mensagens são agrupadas por canal e apagadas com delete_messages (até
+    100 por chamada, uma rota só) em vez de uma chamada por mensagem. Mensagens
+    fora da janela de exclusão em massa seguem pelo delete individual.
+
+    Cada canal tem uma fila limitada: quando ela enche, enqueue() espera
+    (backpressure) em vez de acumular mensagens sem limite.
+    """
+
+    def __init__(self, max_pending: int = 1000, linger: float = 0.5, idle_timeout: float = 60.0,
+                 scheduler: Optional[outbound.OutboundScheduler] = None):
+        self.max_pending = max_pending
+        # com agendador, as exclusões respeitam os limites e prioridades compartilhados
+        self.scheduler = scheduler
+        # espera após a primeira mensagem para juntar as seguintes no mesmo lote
+        self.linger = linger
+        self.idle_timeout = idle_timeout
+        self._queues: Dict[int, asyncio.Queue] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self.stats = {
+            "enqueued": 0,
+            "bulk_calls": 0,
+            "bulk_deleted": 0,
+            "single_deleted": 0,
+            "failed": 0,
+            "max_depth": 0,
+            "waiting_producers": 0,
+        }
+
+    def depth(self, channel_id: Optional[int] = None) -> int:
+        """
+        Mensagens aguardando exclusão (em um canal ou no total).
+        """
+        if channel_id is not None:
+            queue = self._queues.get(channel_id)
+            return queue.qsize() if queue else 0
+        return sum(queue.qsize() for queue in self._queues.values())
+
+    def metrics(self) -> Dict[str, int]:
+        """
+        Contadores e profundidade atual das filas.
+        """
+        data = dict(self.stats)
+        data["depth"] = self.depth()
+        data["channels"] = len(self._queues)
+        return data
+
+    async def enqueue(self, message: discord.Message) -> None:
+        channel_id = message.channel.id
+        queue = self._queues.get(channel_id)
+        if queue is None:
+            queue = self._queues[channel_id] = asyncio.Queue(maxsize=self.max_pending)
+        if channel_id not in self._workers:
+            self._workers[channel_id] = asyncio.create_task(self._worker(message.channel, queue))
+
+        if queue.full():
+            self.stats["waiting_producers"] += 1
+            try:
+                await queue.put(message)
+            finally:
+                self.stats["waiting_producers"] -= 1
+        else:
+            queue.put_nowait(message)
+        self.stats["enqueued"] += 1
+        self.stats["max_depth"] = max(self.stats["max_depth"], queue.qsize())
+
+    async def _worker(self, channel, queue: asyncio.Queue) -> None:
+        try:
+            while True:
+                try:
+                    first = await asyncio.wait_for(queue.get(), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    return
+                if self.linger:
+                    await asyncio.sleep(self.linger)
+                batch = [first]
+                while len(batch) < BULK_DELETE_LIMIT and not queue.empty():
+                    batch.append(queue.get_nowait())
+                try:
+                    await self._delete_batch(channel, batch)
+                except Exception as e:
+                    self.stats["failed"] += len(batch)
+                    logger.error(f"Erro ao apagar lote no canal {channel.id}: {e}")
+                finally:
+                    for _ in batch:
+                        queue.task_done()
+        finally:
+            # sem await entre o timeout e a remoção: nenhuma mensagem entra numa fila órfã
+            self._workers.pop(channel.id, None)
+            if queue.empty():
+                self._queues.pop(channel.id, None)
+
+    async def _call(self, route, factory):
+        if self.scheduler is None:
+            return await factory()
+        return await self.scheduler.submit(route, outbound.PRIORITY_BULK, factory)
+
+    async def _delete_batch(self, channel, batch: List[discord.Message]) -> None:
+        cutoff = datetime.now(timezone.utc) - BULK_DELETE_MAX_AGE
+        recent = [m for m in batch if m.created_at > cutoff]
+        old = [m for m in batch if m.created_at <= cutoff]
+
+        if len(recent) >= 2:
+            try:
+                await self._call(("bulk_delete", channel.id), lambda: channel.delete_messages(recent))
+                self.stats["bulk_calls"] += 1
+                self.stats["bulk_deleted"] += len(recent)
+                recent = []
+            except discord.HTTPException as e:
+                logger.warning(f"Exclusão em massa falhou no canal {channel.id}, apagando uma a uma: {e}")
+
+        for message in recent + old:
+            try:
+                await self._call(("delete", channel.id), message.delete)
+                self.stats["single_deleted"] += 1
+            except discord.NotFound:
+                pass
+            except discord.HTTPException as e:
+                self.stats["failed"] += 1
+                logger.error(f"Erro ao deletar mensagem no chat bloqueado: {e}")
@@ -0,0 +1,292 @@
+import asyncio
+import bisect
+import contextvars
+import functools
+import inspect
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# limites (segundos) dos histogramas de latência
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# limites dos histogramas de contagem (chamadas REST por handler)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+class Histogram:
+    """
+    Histograma com baldes fixos (para exportação) e uma janela das últimas
+    amostras (para p50/p95/p99 sem guardar tudo).
+    """
+
+    __slots__ = ("buckets", "counts", "count", "sum", "recent")
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS, window: int = 2048):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent: deque = deque(maxlen=window)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def quantiles(self, qs: Iterable[float] = (0.5, 0.95, 0.99)) -> Dict[float, float]:
+        data = sorted(self.recent)
+        if not data:
+            return {q: 0.0 for q in qs}
+        return {q: data[min(len(data) - 1, max(0, math.ceil(q * len(data)) - 1))] for q in qs}
+
+class Span:
+    """
+    Medição de uma execução de handler: tempo em db.* e chamadas REST feitas.
+    """
+
+    __slots__ = ("name", "db_time", "db_calls", "rest_calls")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.db_time = 0.0
+        self.db_calls = 0
+        self.rest_calls = 0
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("metrics_span", default=None)
+# evita contar duas vezes chamadas do banco feitas dentro de outras
+_in_db_call: contextvars.ContextVar[bool] = contextvars.ContextVar("metrics_in_db", default=False)
+
+# (métrica, rótulo) -> histograma
+histograms: Dict[Tuple[str, str], Histogram] = {}
+# (métrica, rótulo) -> valor acumulado
+counters: Dict[Tuple[str, str], float] = {}
+# (métrica, rótulo) -> último valor
+gauges: Dict[Tuple[str, str], float] = {}
+
+def histogram(metric: str, label: str = "", buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+    key = (metric, label)
+    hist = histograms.get(key)
+    if hist is None:
+        hist = histograms[key] = Histogram(buckets)
+    return hist
+
+def inc(metric: str, label: str = "", value: float = 1) -> None:
+    key = (metric, label)
+    counters[key] = counters.get(key, 0) + value
+
+def set_gauge(metric: str, value: float, label: str = "") -> None:
+    gauges[(metric, label)] = value
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+def profiled(name: str):
+    """
+    Decorador para handlers assíncronos (comandos, modal, botões, eventos).
+
+    Registra por handler: tempo total, tempo dentro de db.* e número de
+    chamadas REST, além de contar erros.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            span = Span(name)
+            token = _current_span.set(span)
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                inc("handler_errors_total", name)
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                _current_span.reset(token)
+                inc("handler_calls_total", name)
+                histogram("handler_seconds", name).observe(elapsed)
+                histogram("handler_db_seconds", name).observe(span.db_time)
+                histogram("handler_rest_calls", name, COUNT_BUCKETS).observe(span.rest_calls)
+        return wrapper
+    return decorator
+
+def _timed_db_call(func, name: str):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _in_db_call.get():
+            return func(*args, **kwargs)
+        token = _in_db_call.set(True)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            _in_db_call.reset(token)
+            span = _current_span.get()
+            if span is not None:
+                span.db_time += elapsed
+                span.db_calls += 1
+            histogram("db_call_seconds", name).observe(elapsed)
+    return wrapper
+
+def instrument_module(module: Any) -> None:
+    """
+    Troca as funções públicas síncronas do módulo (ex.: database) por versões
+    cronometradas. Quem chama via `db.funcao` passa a ser medido.
+    """
+    for name, func in list(vars(module).items()):
+        if name.startswith("_") or not inspect.isfunction(func):
+            continue
+        if func.__module__ != module.__name__ or inspect.iscoroutinefunction(func):
+            continue
+        setattr(module, name, _timed_db_call(func, name))
+
+def instrument_http(http: Any) -> None:
+    """
+    Conta as requisições REST do discord.py (por rota e por handler em execução).
+    """
+    original = http.request
+
+    @functools.wraps(original)
+    async def request(route, **kwargs):
+        span = _current_span.get()
+        if span is not None:
+            span.rest_calls += 1
+        inc("rest_requests_total", f"{route.method} {route.path}")
+        return await original(route, **kwargs)
+
+    http.request = request
+
+async def monitor_loop_lag(interval: float = 0.5) -> None:
+    """
+    Mede o atraso do event loop: quanto um sleep(interval) passa do previsto.
+    """
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.perf_counter() - start - interval)
+        histogram("event_loop_lag_seconds").observe(lag)
+        set_gauge("event_loop_lag_last_seconds", lag)
+
+def handler_summary() -> Dict[str, Dict[str, Any]]:
+    """
+    Resumo por handler: chamadas, erros, p50/p95/p99 do tempo total e do
+    tempo em banco, e média de chamadas REST.
+    """
+    summary = {}
+    for (metric, name), hist in list(histograms.items()):
+        if metric != "handler_seconds":
+            continue
+        db_hist = histograms.get(("handler_db_seconds", name))
+        rest_hist = histograms.get(("handler_rest_calls", name))
+        summary[name] = {
+            "calls": hist.count,
+            "errors": int(counters.get(("handler_errors_total", name), 0)),
+            "wall": hist.quantiles(),
+            "db": db_hist.quantiles() if db_hist else {},
+            "rest_avg": (rest_hist.sum / rest_hist.count) if rest_hist and rest_hist.count else 0.0,
+        }
+    return summary
+
+# nome do rótulo de cada métrica na exportação Prometheus
+LABEL_NAMES = {
+    "handler_seconds": "handler",
+    "handler_db_seconds": "handler",
+    "handler_rest_calls": "handler",
+    "handler_calls_total": "handler",
+    "handler_errors_total": "handler",
+    "db_call_seconds": "function",
+    "db_flush_seconds": "mode",
+    "rest_requests_total": "route",
+    "queue_depth": "queue",
+}
+PROMETHEUS_PREFIX = "sorteio_"
+
+# texto já renderizado; trocado por inteiro a cada publicação, então quem lê
+# (ex.: a thread HTTP) nunca precisa de lock nem toca nas estruturas vivas
+_snapshot = ""
+# nomes já avisados por conflito de tipo (evita repetir o log a cada publicação)
+_type_conflicts: Set[str] = set()
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(metric: str, label: str, extra: str = "") -> str:
+    parts = []
+    if label:
+        parts.append(f'{LABEL_NAMES.get(metric, "name")}="{_escape(label)}"')
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and math.isnan(value):
+        return "NaN"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def render_prometheus(extra_gauges: Optional[Dict[Tuple[str, str], float]] = None) -> str:
+    """
+    Renderiza contadores, gauges e histogramas no formato de texto do Prometheus.
+    """
+    out = []
+    kinds: Dict[str, str] = {}
+
+    def header(name: str, kind: str) -> bool:
+        # um nome, um tipo: o primeiro registrado vale e os demais são recusados
+        known = kinds.get(name)
+        if known is None:
+            kinds[name] = kind
+            out.append(f"# TYPE {name} {kind}")
+            return True
+        if known != kind:
+            if name not in _type_conflicts:
+                _type_conflicts.add(name)
+                logger.warning(f"Métrica {name} registrada como {known} e {kind}; ignorando o {kind}")
+            return False
+        return True
+
+    for (metric, label), value in sorted(list(counters.items())):
+        name = PROMETHEUS_PREFIX + metric
+        if not header(name, "counter"):
+            continue
+        out.append(f"{name}{_labels(metric, label)} {_number(value)}")
+
+    all_gauges = dict(list(gauges.items()))
+    all_gauges.update(extra_gauges or {})
+    for (metric, label), value in sorted(all_gauges.items()):
+        name = PROMETHEUS_PREFIX + metric
+        if not header(name, "gauge"):
+            continue
+        out.append(f"{name}{_labels(metric, label)} {_number(value)}")
+
+    for (metric, label), hist in sorted(list(histograms.items())):
+        name = PROMETHEUS_PREFIX + metric
+        if not header(name, "histogram"):
+            continue
+        counts = list(hist.counts)
+        cumulative = 0
+        for bound, count in zip(list(hist.buckets) + [math.inf], counts):
+            cumulative += count
+            le = 'le="' + _number(float(bound)) + '"'
+            out.append(f"{name}_bucket{_labels(metric, label, le)} {cumulative}")
+        out.append(f"{name}_sum{_labels(metric, label)} {_number(float(hist.sum))}")
+        out.append(f"{name}_count{_labels(metric, label)} {cumulative}")
+
+    return "\n".join(out) + "\n"
+
+def publish(extra_gauges: Optional[Dict[Tuple[str, str], float]] = None) -> None:
+    """
+    Renderiza e publica um novo snapshot (chamar a partir do event loop).
+    """
+    global _snapshot
+    _snapshot = render_prometheus(extra_gauges)
+
+def snapshot() -> str:
+    """
+    Último snapshot publicado; seguro para ler de qualquer thread.
+    """
+    return _snapshot
@@ -0,0 +1,262 @@
+import asyncio
+import contextvars
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# prioridades (menor sai primeiro)
+PRIORITY_ACK = 0            # respostas/followups de interação
+PRIORITY_REGISTRATION = 1   # postagens de inscrição
+PRIORITY_ANNOUNCEMENT = 2   # /anunciar, /setup_inscricao
+PRIORITY_BULK = 3           # exclusões do chat bloqueado, edições de progresso
+PRIORITY_REACTION = 4       # reações ✅
+PRIORITY_NAMES = {
+    PRIORITY_ACK: "ack",
+    PRIORITY_REGISTRATION: "registration",
+    PRIORITY_ANNOUNCEMENT: "announcement",
+    PRIORITY_BULK: "bulk",
+    PRIORITY_REACTION: "reaction",
+}
+
+# tipo de rota -> (capacidade, segundos para reencher tudo, conta no limite global)
+# valores conservadores abaixo dos limites documentados do Discord
+ROUTE_LIMITS: Dict[str, Tuple[int, float, bool]] = {
+    "interaction": (5, 2.0, False),  # followups usam o token da interação, fora do limite global
+    "send": (5, 5.0, True),
+    "edit": (5, 5.0, True),
+    "delete": (5, 1.0, True),
+    "bulk_delete": (1, 1.0, True),
+    "reaction": (1, 0.3, True),
+}
+GLOBAL_LIMIT = (45, 1.0)
+
+class TokenBucket:
+    """
+    Balde de fichas: `capacity` chamadas de uma vez, reenchendo continuamente em `period` segundos.
+    """
+
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity: int, period: float):
+        self.capacity = float(capacity)
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+class _Call:
+    __slots__ = ("route", "priority", "factory", "future", "coalesce_key", "enqueued_at", "context")
+
+    def __init__(self, route, priority, factory, future, coalesce_key):
+        # a chamada roda no contexto de quem pediu (métricas por handler)
+        self.context = contextvars.copy_context()
+        self.route = route
+        self.priority = priority
+        self.factory = factory
+        self.future = future
+        self.coalesce_key = coalesce_key
+        self.enqueued_at = time.monotonic()
+
+class OutboundScheduler:
+    """
+    Agendador central das chamadas REST de saída.
+
+    Cada chamada informa a rota (ex.: ("send", channel_id)) e a prioridade.
+    O despachante sempre libera primeiro a chamada de maior prioridade cuja
+    rota tem ficha disponível, então respostas de interação nunca esperam
+    atrás de anúncios ou reações. Chamadas com a mesma `coalesce_key` ainda
+    não enviadas são fundidas: vale a mais recente (ex.: edições de progresso).
+    """
+
+    def __init__(self, route_limits: Optional[Dict[str, Tuple[int, float, bool]]] = None,
+                 global_limit: Optional[Tuple[int, float]] = GLOBAL_LIMIT):
+        self.route_limits = dict(ROUTE_LIMITS if route_limits is None else route_limits)
+        self._global = TokenBucket(*global_limit) if global_limit else None
+        self._buckets: Dict[Hashable, TokenBucket] = {}
+        # prioridade -> rota -> chamadas em ordem de chegada
+        self._queues: List[Dict[Hashable, Deque[_Call]]] = [{} for _ in PRIORITY_NAMES]
+        self._coalescing: Dict[Hashable, _Call] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        # o loop só guarda referências fracas das tasks: mantém as em execução vivas
+        self._running: Set[asyncio.Task] = set()
+        self._in_flight = 0
+        self.stats: Dict[str, Any] = {
+            "submitted": 0,
+            "dispatched": 0,
+            "coalesced": 0,
+            "failed": 0,
+            "wait_total": {name: 0.0 for name in PRIORITY_NAMES.values()},
+            "wait_max": {name: 0.0 for name in PRIORITY_NAMES.values()},
+            "dispatched_by_priority": {name: 0 for name in PRIORITY_NAMES.values()},
+        }
+
+    def _ensure_running(self) -> None:
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._dispatch_loop(), name="outbound-dispatcher")
+
+    def depth(self, priority: Optional[int] = None) -> int:
+        levels = self._queues if priority is None else [self._queues[priority]]
+        return sum(len(calls) for level in levels for calls in level.values())
+
+    def metrics(self) -> Dict[str, Any]:
+        data = {key: (dict(value) if isinstance(value, dict) else value) for key, value in self.stats.items()}
+        data["depth"] = {PRIORITY_NAMES[p]: self.depth(p) for p in PRIORITY_NAMES}
+        data["in_flight"] = self._in_flight
+        return data
+
+    async def submit(self, route: Tuple[str, Any], priority: int,
+                     factory: Callable[[], Awaitable[Any]], coalesce_key: Hashable = None) -> Any:
+        """
+        Agenda `factory()` (que cria a corrotina da chamada REST) e espera o resultado.
+
+        Args:
+            route: (tipo, id) - o tipo define o limite em ROUTE_LIMITS
+            priority: Uma das constantes PRIORITY_*
+            factory: Função sem argumentos que devolve a corrotina a executar
+            coalesce_key: Funde com uma chamada pendente de mesma chave
+
+        Returns:
+            O resultado da chamada
+        """
+        self._ensure_running()
+        self.stats["submitted"] += 1
+        if coalesce_key is not None:
+            pending = self._coalescing.get(coalesce_key)
+            if pending is not None:
+                pending.factory = factory
+                self.stats["coalesced"] += 1
+                return await asyncio.shield(pending.future)
+
+        call = _Call(route, priority, factory, asyncio.get_running_loop().create_future(), coalesce_key)
+        self._queues[priority].setdefault(route, deque()).append(call)
+        if coalesce_key is not None:
+            self._coalescing[coalesce_key] = call
+        self._wakeup.set()
+        return await asyncio.shield(call.future)
+
+    def _bucket(self, route: Tuple[str, Any]) -> Optional[TokenBucket]:
+        limit = self.route_limits.get(route[0])
+        if limit is None:
+            return None
+        bucket = self._buckets.get(route)
+        if bucket is None:
+            bucket = self._buckets[route] = TokenBucket(limit[0], limit[1])
+        return bucket
+
+    def _next_ready(self) -> Tuple[Optional[_Call], float]:
+        now = time.monotonic()
+        delay = float("inf")
+        global_wait = self._global.wait_time(now) if self._global else 0.0
+
+        for level in self._queues:
+            for route in list(level):
+                calls = level[route]
+                if not calls:
+                    del level[route]
+                    continue
+                limit = self.route_limits.get(route[0])
+                counts_global = limit[2] if limit else True
+                if counts_global and global_wait > 0:
+                    delay = min(delay, global_wait)
+                    continue
+                bucket = self._bucket(route)
+                wait = bucket.wait_time(now) if bucket else 0.0
+                if wait > 0:
+                    delay = min(delay, wait)
+                    continue
+                if bucket:
+                    bucket.take(now)
+                if counts_global and self._global:
+                    self._global.take(now)
+                call = calls.popleft()
+                if not calls:
+                    del level[route]
+                return call, 0.0
+        return None, delay
+
+    def _prune_buckets(self) -> None:
+        # rotas de interação são muitas e de vida curta; descarta baldes já cheios
+        if len(self._buckets) > 1000:
+            now = time.monotonic()
+            for route in [r for r, b in self._buckets.items() if b.is_full(now)]:
+                del self._buckets[route]
+
+    async def _dispatch_loop(self) -> None:
+        try:
+            await self._dispatch()
+        except asyncio.CancelledError:
+            # encerramento: ninguém fica esperando uma chamada que não vai sair
+            for level in self._queues:
+                for calls in level.values():
+                    for call in calls:
+                        call.future.cancel()
+                level.clear()
+            self._coalescing.clear()
+            raise
+
+    async def _dispatch(self) -> None:
+        while True:
+            call, delay = self._next_ready()
+            if call is None:
+                self._wakeup.clear()
+                self._prune_buckets()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), None if delay == float("inf") else delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            if call.coalesce_key is not None and self._coalescing.get(call.coalesce_key) is call:
+                del self._coalescing[call.coalesce_key]
+            task = asyncio.create_task(self._execute(call), context=call.context)
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+            # deixa o loop respirar entre despachos em rajada
+            await asyncio.sleep(0)
+
+    async def _execute(self, call: _Call) -> None:
+        name = PRIORITY_NAMES[call.priority]
+        waited = time.monotonic() - call.enqueued_at
+        self.stats["dispatched"] += 1
+        self.stats["dispatched_by_priority"][name] += 1
+        self.stats["wait_total"][name] += waited
+        self.stats["wait_max"][name] = max(self.stats["wait_max"][name], waited)
+        self._in_flight += 1
+        try:
+            result = await call.factory()
+        except asyncio.CancelledError:
+            if not call.future.done():
+                call.future.cancel()
+            raise
+        except Exception as e:
+            self.stats["failed"] += 1
+            if not call.future.done():
+                call.future.set_exception(e)
+        else:
+            if not call.future.done():
+                call.future.set_result(result)
+        finally:
+            self._in_flight -= 1
+            if call.future.done() and not call.future.cancelled():
+                # evita "exception was never retrieved" quando ninguém mais espera
+                call.future.exception()
@@ -0,0 +1,194 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Erros transitórios: rate limit, falha do Discord (5xx) ou de rede.
+    """
+    if isinstance(error, discord.HTTPException):
+        return error.status == 429 or error.status >= 500
+    return isinstance(error, (asyncio.TimeoutError, OSError))
+
+class RegistrationPipeline:
+    """
+    Fila de inscrições processadas por um número fixo de workers.
+
+    O modal só valida e enfileira; os workers postam no canal de inscrições
+    (o ritmo dos envios fica com o agendador de saída, outbound.py) e repetem
+    erros transitórios com backoff exponencial.
+
+    Cada job é um dict com pelo menos "user_id"; o handler recebe o job e
+    pode guardar nele o que já foi feito, para que uma nova tentativa não
+    repita efeitos (ex.: postar a mensagem duas vezes).
+    """
+
+    def __init__(self, handler: Callable[[Dict[str, Any]], Awaitable[None]],
+                 on_failure: Optional[Callable[[Dict[str, Any], Exception], Awaitable[None]]] = None,
+                 workers: int = 3, maxsize: int = 5000, max_attempts: int = 4,
+                 retry_base: float = 1.0):
+        self.handler = handler
+        self.on_failure = on_failure
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base = retry_base
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._pending: Set[int] = set()
+        self._tasks: List[asyncio.Task] = []
+        self.stats = {
+            "submitted": 0,
+            "processed": 0,
+            "failed": 0,
+            "retries": 0,
+            "rejected_full": 0,
+        }
+
+    def start(self) -> None:
+        """
+        Inicia os workers (idempotente; precisa de um event loop rodando).
+        """
+        self._tasks = [task for task in self._tasks if not task.done()]
+        for i in range(len(self._tasks), self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(), name=f"inscricao-worker-{i}"))
+
+    def is_pending(self, user_id: int) -> bool:
+        return user_id in self._pending
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def metrics(self) -> Dict[str, int]:
+        data = dict(self.stats)
+        data["depth"] = self._queue.qsize()
+        data["pending"] = len(self._pending)
+        return data
+
+    def submit(self, job: Dict[str, Any]) -> Optional[int]:
+        """
+        Enfileira um job.
+
+        Returns:
+            Posição na fila, ou None se a fila estiver cheia
+        """
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.stats["rejected_full"] += 1
+            return None
+        job.setdefault("enqueued_at", time.monotonic())
+        self._pending.add(job["user_id"])
+        self.stats["submitted"] += 1
+        return self._queue.qsize()
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._pending.discard(job["user_id"])
+                self._queue.task_done()
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await self.handler(job)
+                self.stats["processed"] += 1
+                return
+            except Exception as e:
+                if attempt < self.max_attempts and is_retryable(e):
+                    self.stats["retries"] += 1
+                    delay = getattr(e, "retry_after", None) or self.retry_base * (2 ** (attempt - 1))
+                    logger.warning(f"Inscrição de {job['user_id']} falhou (tentativa {attempt}), "
+                                   f"repetindo em {delay:.1f}s: {e}")
+                    await asyncio.sleep(delay)
+                    continue
+                self.stats["failed"] += 1
+                logger.error(f"Erro ao processar inscrição de {job['user_id']}: {e}", exc_info=True)
+                if self.on_failure:
+                    try:
+                        await self.on_failure(job, e)
+                    except Exception:
+                        pass
+                return
+
+class ReactionStamper:
+    """
+    Marca mensagens com uma reação em segundo plano.
+
+    stamp() só enfileira e retorna na hora; um worker aplica as reações com
+    intervalo mínimo entre elas (reações têm limite bem apertado no Discord)
+    e repete erros transitórios. Se a fila encher, a marcação é descartada:
+    a reação é cosmética e não pode segurar as inscrições.
+    """
+
+    def __init__(self, add: Callable[[Any], Awaitable[Any]], interval: float = 0.5,
+                 maxsize: int = 10000, max_attempts: int = 3, retry_base: float = 2.0):
+        self.add = add
+        self.interval = interval
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base = retry_base
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"stamped": 0, "dropped": 0, "failed": 0, "retries": 0}
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._worker(), name="reaction-stamper")
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def metrics(self) -> Dict[str, int]:
+        data = dict(self.stats)
+        data["depth"] = self._queue.qsize()
+        return data
+
+    def stamp(self, message: Any) -> bool:
+        """
+        Enfileira a reação sem esperar.
+
+        Returns:
+            False se a fila estava cheia e a reação foi descartada
+        """
+        try:
+            self._queue.put_nowait((message, 1))
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            return False
+        return True
+
+    async def _worker(self) -> None:
+        while True:
+            message, attempt = await self._queue.get()
+            try:
+                await self.add(message)
+                self.stats["stamped"] += 1
+            except discord.NotFound:
+                # mensagem apagada antes da reação
+                pass
+            except Exception as e:
+                if attempt < self.max_attempts and is_retryable(e):
+                    self.stats["retries"] += 1
+                    # volta para o fim da fila depois do backoff, sem travar as demais
+                    asyncio.get_running_loop().call_later(
+                        self.retry_base * (2 ** (attempt - 1)), self._requeue, message, attempt + 1
+                    )
+                else:
+                    self.stats["failed"] += 1
+                    logger.warning(f"Erro ao reagir à mensagem {getattr(message, 'id', '?')}: {e}")
+            finally:
+                self._queue.task_done()
+            if self.interval:
+                await asyncio.sleep(self.interval)
+
+    def _requeue(self, message: Any, attempt: int) -> None:
+        try:
+            self._queue.put_nowait((message, attempt))
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
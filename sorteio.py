@@ -0,0 +1,274 @@
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+SNAPSHOT_FORMAT = "sorteio-snapshot/1"
+
+class DrawRng:
+    """
+    Gerador determinístico para o sorteio.
+
+    Cada número vem de SHA-256("<semente>:<contador>") com rejeição para evitar
+    viés no módulo, então qualquer pessoa consegue reproduzir a sequência com a
+    mesma semente, em qualquer linguagem.
+    """
+
+    def __init__(self, seed: str):
+        self.seed = str(seed)
+        self.counter = 0
+
+    def _next_block(self) -> int:
+        digest = hashlib.sha256(f"{self.seed}:{self.counter}".encode("utf-8")).digest()
+        self.counter += 1
+        return int.from_bytes(digest, "big")
+
+    def randbelow(self, n: int) -> int:
+        """
+        Sorteia um inteiro uniforme em [0, n).
+        """
+        if n <= 0:
+            raise ValueError("n deve ser positivo")
+        # maior múltiplo de n que cabe em 256 bits
+        limit = (1 << 256) - ((1 << 256) % n)
+        while True:
+            value = self._next_block()
+            if value < limit:
+                return value % n
+
+class WeightedPool:
+    """
+    Árvore de Fenwick sobre os pesos (fichas) dos participantes.
+
+    Localizar o dono de uma ficha e retirar um participante custam O(log N),
+    sem materializar uma lista com uma entrada por ficha.
+    """
+
+    def __init__(self, weights: Sequence[int]):
+        n = len(weights)
+        self._weights = [max(0, int(w)) for w in weights]
+        tree = [0] * (n + 1)
+        for i, w in enumerate(self._weights, 1):
+            tree[i] += w
+            parent = i + (i & -i)
+            if parent <= n:
+                tree[parent] += tree[i]
+        self._tree = tree
+        self._size = n
+        self.total = sum(self._weights)
+        top = 1
+        while top * 2 <= n:
+            top *= 2
+        self._top = top if n else 0
+
+    def find(self, ticket: int) -> int:
+        """
+        Índice do participante dono da ficha `ticket` (0 <= ticket < total),
+        contando as fichas na ordem dos participantes.
+        """
+        if not 0 <= ticket < self.total:
+            raise IndexError("ficha fora do intervalo")
+        pos = 0
+        step = self._top
+        tree = self._tree
+        while step:
+            nxt = pos + step
+            if nxt <= self._size and tree[nxt] <= ticket:
+                pos = nxt
+                ticket -= tree[nxt]
+            step >>= 1
+        return pos
+
+    def remove(self, index: int) -> None:
+        """
+        Zera o peso de um participante (sorteio sem reposição).
+        """
+        w = self._weights[index]
+        if not w:
+            return
+        self._weights[index] = 0
+        self.total -= w
+        i = index + 1
+        while i <= self._size:
+            self._tree[i] -= w
+            i += i & -i
+
+def canonical_entries(totals: Dict[str, int]) -> List[Tuple[str, int]]:
+    """
+    Ordena as entradas (user_id, fichas) de forma canônica: por ID numérico.
+
+    A ordem define a numeração das fichas, então precisa ser a mesma em
+    qualquer reprodução do sorteio.
+    """
+    return sorted(((str(uid), int(total)) for uid, total in totals.items()),
+                  key=lambda e: (len(e[0]), e[0]))
+
+def draw(entries: Sequence[Tuple[str, int]], winners: int, seed: str) -> List[Dict[str, Any]]:
+    """
+    Sorteia ganhadores sem reposição, com chance proporcional às fichas.
+
+    Args:
+        entries: Lista (user_id, fichas) na ordem canônica
+        winners: Quantidade de ganhadores
+        seed: Semente do gerador (reproduz exatamente o mesmo resultado)
+
+    Returns:
+        Lista de dicts com position, user_id, tickets, ticket (ficha sorteada,
+        numerada a partir de 0 entre as restantes) e pool_total
+    """
+    ids = [uid for uid, _ in entries]
+    pool = WeightedPool([w for _, w in entries])
+    rng = DrawRng(seed)
+    results: List[Dict[str, Any]] = []
+
+    for position in range(1, max(0, int(winners)) + 1):
+        if pool.total <= 0:
+            break
+        pool_total = pool.total
+        ticket = rng.randbelow(pool_total)
+        index = pool.find(ticket)
+        results.append({
+            "position": position,
+            "user_id": ids[index],
+            "tickets": int(entries[index][1]),
+            "ticket": ticket,
+            "pool_total": pool_total
+        })
+        pool.remove(index)
+
+    return results
+
+def _dumps(obj: Dict[str, Any]) -> str:
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+def snapshot_lines(entries: Sequence[Tuple[str, int]]) -> Iterator[str]:
+    """
+    Linhas do snapshot congelado: um cabeçalho e uma linha por participante,
+    em JSON compacto com chaves ordenadas (bytes determinísticos).
+    """
+    yield _dumps({
+        "format": SNAPSHOT_FORMAT,
+        "participants": len(entries),
+        "total_tickets": sum(int(t) for _, t in entries)
+    }) + "\n"
+    for user_id, tickets in entries:
+        yield _dumps({"user_id": str(user_id), "tickets": int(tickets)}) + "\n"
+
+def write_snapshot(path: str, entries: Sequence[Tuple[str, int]]) -> str:
+    """
+    Grava o snapshot e devolve seu SHA-256 (o compromisso publicado).
+
+    Args:
+        path: Arquivo de destino
+        entries: Entradas na ordem canônica
+
+    Returns:
+        Hash SHA-256 (hex) dos bytes gravados
+    """
+    digest = hashlib.sha256()
+    with open(path, 'wb') as f:
+        for line in snapshot_lines(entries):
+            data = line.encode("utf-8")
+            digest.update(data)
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    return digest.hexdigest()
+
+def read_snapshot(path: str) -> Tuple[List[Tuple[str, int]], str]:
+    """
+    Lê um snapshot em streaming, validando o cabeçalho.
+
+    Args:
+        path: Arquivo do snapshot
+
+    Returns:
+        (entradas na ordem do arquivo, SHA-256 hex do arquivo)
+    """
+    digest = hashlib.sha256()
+    header: Optional[Dict[str, Any]] = None
+    entries: List[Tuple[str, int]] = []
+    with open(path, 'rb') as f:
+        for raw in f:
+            digest.update(raw)
+            obj = json.loads(raw)
+            if header is None:
+                header = obj
+                if header.get("format") != SNAPSHOT_FORMAT:
+                    raise ValueError(f"Formato de snapshot desconhecido: {header.get('format')}")
+                continue
+            entries.append((str(obj["user_id"]), int(obj["tickets"])))
+    if header is None:
+        raise ValueError("Snapshot vazio")
+    if header.get("participants") != len(entries) or \
+            header.get("total_tickets") != sum(t for _, t in entries):
+        raise ValueError("Cabeçalho do snapshot não confere com as entradas")
+    return entries, digest.hexdigest()
+
+def seed_commitment(seed: str) -> str:
+    """
+    Compromisso da semente secreta: publicado antes do sorteio, revelado depois.
+    """
+    return hashlib.sha256(str(seed).encode("utf-8")).hexdigest()
+
+def normalize_entropy(public_entropy: str) -> str:
+    """
+    Forma canônica da entropia pública: a sequência de valores da fonte.
+
+    O texto é dividido em tokens de letras/dígitos (qualquer outro caractere
+    separa); tokens numéricos perdem os zeros à esquerda, letras ficam em
+    minúsculas e os tokens são unidos por "-". Assim "01 02 03", "1-2-3" e
+    "1, 2, 3" viram "1-2-3". Dígitos sem separador ("010203") formam um único
+    valor, diferente de "1-2-3": a divisão em tokens faz parte do resultado e
+    deve seguir a publicação da fonte. A forma canônica é a que entra na
+    semente, no log de revelação e no comando de verificação.
+    """
+    tokens = re.findall(r"[^\W_]+", str(public_entropy or "").lower())
+    return "-".join(str(int(token)) if token.isdecimal() else token for token in tokens)
+
+def effective_seed(secret_seed: str, snapshot_sha256: str, public_entropy: str = "") -> str:
+    """
+    Semente efetiva do sorteio: amarra a semente secreta ao snapshot congelado
+    e ao valor da fonte de entropia pública declarada no congelamento.
+    """
+    return f"{secret_seed}:{snapshot_sha256}:{normalize_entropy(public_entropy)}"
+
+def append_log(path: str, entry: Dict[str, Any]) -> None:
+    """
+    Acrescenta um registro ao log de compromissos (append-only, um JSON por linha).
+    """
+    entry = dict(entry)
+    entry.setdefault("timestamp", datetime.now().isoformat())
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(_dumps(entry) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+def replay(snapshot_path: str, secret_seed: str, winners: int,
+           public_entropy: str = "") -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Reproduz um sorteio a partir do snapshot exportado.
+
+    Returns:
+        (SHA-256 do snapshot, ganhadores)
+    """
+    entries, snapshot_sha256 = read_snapshot(snapshot_path)
+    seed = effective_seed(secret_seed, snapshot_sha256, public_entropy)
+    return snapshot_sha256, draw(entries, winners, seed)
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Reproduz um sorteio a partir do snapshot exportado")
+    parser.add_argument("snapshot", help="Arquivo .jsonl do snapshot")
+    parser.add_argument("semente", help="Semente secreta revelada após o sorteio")
+    parser.add_argument("quantidade", type=int, help="Quantidade de ganhadores")
+    parser.add_argument("--entropia", default="", help="Valor da fonte de entropia declarada no congelamento")
+    args = parser.parse_args()
+
+    sha, results = replay(args.snapshot, args.semente, args.quantidade, args.entropia)
+    print(f"SHA-256 do snapshot: {sha}")
+    print(f"Compromisso da semente: {seed_commitment(args.semente)}")
+    for r in results:
+        print(f"{r['position']}º {r['user_id']} ({r['tickets']} fichas, ficha {r['ticket'] + 1}/{r['pool_total']})")
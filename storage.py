@@ -0,0 +1,665 @@
+import json
+import os
+import sqlite3
+import threading
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def apply_op(data: Dict[str, Any], op: Dict[str, Any]) -> None:
+    """
+    Aplica uma mutação do journal sobre o dicionário do banco.
+
+    Operações suportadas:
+      {"op": "set", "path": [...], "value": ...}  -> define o valor no caminho
+      {"op": "del", "path": [...]}                -> remove a chave do caminho
+    Um path vazio em "set" substitui o banco inteiro.
+    Ambas são idempotentes, então reaplicar o journal sobre um snapshot que já
+    contém parte dele produz o mesmo estado final.
+
+    Abaixo do primeiro nível (ex.: um participante dentro de "participants")
+    os dicionários do caminho são trocados por cópias em vez de alterados no
+    lugar; assim uma cópia rasa do banco feita antes continua consistente.
+
+    Args:
+        data: Dicionário do banco (alterado in-place)
+        op: Operação a aplicar
+    """
+    path = op.get("path") or []
+    kind = op.get("op")
+
+    if not path:
+        if kind == "set":
+            data.clear()
+            data.update(op["value"])
+        return
+
+    node = data
+    for depth, key in enumerate(path[:-1]):
+        child = node.get(key)
+        if not isinstance(child, dict):
+            if kind == "del":
+                return
+            child = {}
+        elif depth:
+            child = dict(child)
+        node[key] = child
+        node = child
+
+    if kind == "set":
+        node[path[-1]] = op["value"]
+    elif kind == "del":
+        node.pop(path[-1], None)
+    else:
+        raise ValueError(f"Operação de journal desconhecida: {kind}")
+
+def encode_op(op: Dict[str, Any]) -> str:
+    """
+    Serializa uma operação como uma linha compacta do journal.
+
+    Args:
+        op: Operação a serializar
+
+    Returns:
+        String JSON sem quebras de linha
+    """
+    return json.dumps(op, ensure_ascii=False, separators=(",", ":"))
+
+# entradas por chamada do encoder ao serializar tabelas grandes do snapshot
+SNAPSHOT_CHUNK = 500
+
+def encode_snapshot(data: Dict[str, Any]) -> str:
+    """
+    Serializa o banco em JSON compacto, tabela grande em partes.
+
+    O encoder em C não solta o GIL: um json.dumps único de dezenas de milhares
+    de participantes travaria as outras threads (o loop do bot) até terminar.
+    Em partes de SNAPSHOT_CHUNK entradas, o interpretador alterna entre elas.
+
+    Args:
+        data: Banco (ou cópia) a serializar
+
+    Returns:
+        String JSON equivalente a json.dumps(data)
+    """
+    parts = []
+    for key, value in data.items():
+        if isinstance(value, dict) and len(value) > SNAPSHOT_CHUNK:
+            items = list(value.items())
+            chunks = [
+                json.dumps(dict(items[i:i + SNAPSHOT_CHUNK]), ensure_ascii=False)[1:-1]
+                for i in range(0, len(items), SNAPSHOT_CHUNK)
+            ]
+            encoded = "{" + ",".join(chunks) + "}"
+        else:
+            encoded = json.dumps(value, ensure_ascii=False)
+        parts.append(json.dumps(str(key), ensure_ascii=False) + ":" + encoded)
+    return "{" + ",".join(parts) + "}"
+
+def _fsync_dir(path: str) -> None:
+    # garante que o rename chegou ao disco (não suportado em alguns sistemas)
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+class JsonStorage:
+    """
+    Snapshot JSON + journal append-only de mutações.
+
+    Cada mutação é uma linha em `<base>.journal.jsonl`, então o custo de uma
+    escrita não depende do número de participantes. O snapshot só é reescrito
+    na compactação, que dobra o journal no arquivo principal. Na inicialização
+    o estado é o snapshot mais a reaplicação do journal.
+    """
+
+    def __init__(self, path: str, backups: int = 0):
+        self.path = path
+        # quantos snapshots anteriores manter (<arquivo>.1 é o mais recente)
+        self.backups = max(0, int(backups))
+        base, _ = os.path.splitext(path)
+        self.journal_path = f"{base}.journal.jsonl"
+        # journal congelado durante uma compactação em andamento
+        self.compacting_path = f"{self.journal_path}.compacting"
+        self.journal_records = 0
+        self._fh = None
+        self._pending_sync = False
+        self._lock = threading.Lock()
+
+    def _snapshot_candidates(self) -> List[str]:
+        return [self.path] + [f"{self.path}.{i}" for i in range(1, self.backups + 1)]
+
+    def _read_snapshot(self, default_factory: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        existing = [p for p in self._snapshot_candidates() if os.path.exists(p)]
+        if not existing:
+            return default_factory()
+        for candidate in existing:
+            try:
+                with open(candidate, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if not isinstance(data, dict):
+                    raise ValueError("conteúdo não é um objeto JSON")
+            except Exception as e:
+                logger.error(f"Snapshot inválido em {candidate}: {e}")
+                continue
+            if candidate != self.path:
+                logger.warning(f"Usando snapshot de backup: {candidate}")
+            return data
+        # nunca inicia vazio por cima de arquivos existentes: exige intervenção
+        raise RuntimeError(f"Nenhum snapshot válido encontrado entre: {', '.join(existing)}")
+
+    def _truncate_torn_tail(self, journal_path: str) -> None:
+        # queda no meio de uma escrita deixa a última linha sem "\n"; sem cortar,
+        # a próxima escrita em modo 'a' seria colada nela e perdida no replay
+        with open(journal_path, 'rb+') as f:
+            end = f.seek(0, os.SEEK_END)
+            if not end:
+                return
+            pos = end
+            while pos > 0:
+                start = max(0, pos - 4096)
+                f.seek(start)
+                chunk = f.read(pos - start)
+                if pos == end and chunk.endswith(b"\n"):
+                    return
+                newline = chunk.rfind(b"\n")
+                if newline >= 0:
+                    pos = start + newline + 1
+                    break
+                pos = start
+            logger.warning(f"Linha incompleta no fim de {journal_path} descartada ({end - pos} bytes)")
+            f.truncate(pos)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _replay(self, data: Dict[str, Any], journal_path: str) -> int:
+        if not os.path.exists(journal_path):
+            return 0
+        self._truncate_torn_tail(journal_path)
+        applied = 0
+        with open(journal_path, 'r', encoding='utf-8') as f:
+            for lineno, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    apply_op(data, json.loads(line))
+                    applied += 1
+                except Exception as e:
+                    # linha truncada por queda no meio da escrita: ignora e segue
+                    logger.warning(f"Linha {lineno} inválida em {journal_path}: {e}")
+        return applied
+
+    def _open_journal(self):
+        if self._fh is None:
+            self._fh = open(self.journal_path, 'a', encoding='utf-8')
+        return self._fh
+
+    def load(self, default_factory: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Lê o snapshot e reaplica os journals pendentes.
+
+        Args:
+            default_factory: Função que gera o banco vazio
+
+        Returns:
+            Dict com o estado atual do banco
+        """
+        data = self._read_snapshot(default_factory)
+        replayed = self._replay(data, self.compacting_path)
+        replayed += self._replay(data, self.journal_path)
+        self.journal_records = replayed
+        if replayed:
+            logger.info(f"Journal reaplicado: {replayed} operação(ões)")
+        return data
+
+    def prepare(self, ops: List[Dict[str, Any]], data: Dict[str, Any]) -> List[str]:
+        """
+        Serializa as operações como linhas do journal.
+
+        Chamado com o banco travado, logo após aplicar as operações em memória.
+
+        Args:
+            ops: Operações já aplicadas em memória
+            data: Banco em memória (não usado pelo journal JSON)
+
+        Returns:
+            Lote a ser passado para write()
+        """
+        return [encode_op(op) for op in ops]
+
+    def write(self, lines: List[str]) -> None:
+        """
+        Acrescenta um lote ao journal.
+
+        O conteúdo vai para o sistema operacional imediatamente (sobrevive à
+        morte do processo); o fsync é feito em lote por sync().
+
+        Args:
+            lines: Retorno de prepare()
+        """
+        if not lines:
+            return
+        with self._lock:
+            fh = self._open_journal()
+            fh.write("".join(line + "\n" for line in lines))
+            fh.flush()
+            self._pending_sync = True
+            self.journal_records += len(lines)
+
+    def sync(self) -> None:
+        """
+        Força o journal para o disco (fsync) se houver escritas pendentes.
+        """
+        with self._lock:
+            if self._pending_sync and self._fh is not None:
+                os.fsync(self._fh.fileno())
+                self._pending_sync = False
+
+    def begin_compaction(self, data: Dict[str, Any], full: bool = False) -> str:
+        """
+        Passa a escrever em um journal novo e serializa o snapshot.
+
+        Roda na thread de I/O, sem o lock do banco: `data` é uma cópia tirada
+        com o banco travado, e os lotes enfileirados depois dela só são
+        gravados quando a compactação termina, então caem no journal novo.
+
+        Args:
+            data: Cópia do banco (não é alterada durante a serialização)
+            full: Ignorado (o snapshot JSON é sempre completo)
+
+        Returns:
+            Snapshot serializado, a ser passado para finish_compaction()
+        """
+        with self._lock:
+            if self._fh is not None:
+                self._fh.flush()
+                os.fsync(self._fh.fileno())
+                self._fh.close()
+                self._fh = None
+            self._pending_sync = False
+            self.journal_records = 0
+            if os.path.exists(self.compacting_path) and os.path.exists(self.journal_path):
+                # compactação anterior falhou: preserva as duas sequências em ordem
+                with open(self.journal_path, 'r', encoding='utf-8') as src, \
+                        open(self.compacting_path, 'a', encoding='utf-8') as dst:
+                    dst.write(src.read())
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                os.remove(self.journal_path)
+            elif os.path.exists(self.journal_path):
+                os.replace(self.journal_path, self.compacting_path)
+        return encode_snapshot(data)
+
+    def _write_snapshot(self, payload: str) -> None:
+        # escreve em arquivo temporário e troca atomicamente: o snapshot
+        # anterior continua íntegro se o processo morrer no meio da escrita
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        if self.backups and os.path.exists(self.path):
+            for i in range(self.backups - 1, 0, -1):
+                older = f"{self.path}.{i}"
+                if os.path.exists(older):
+                    os.replace(older, f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        os.replace(tmp_path, self.path)
+        _fsync_dir(self.path)
+
+    def finish_compaction(self, payload: str) -> None:
+        """
+        Grava o snapshot serializado e descarta o journal congelado.
+
+        Enquanto o journal congelado existir, uma queda entre as trocas de
+        arquivo é recuperada a partir do snapshot anterior + journal.
+
+        Args:
+            payload: Retorno de begin_compaction()
+        """
+        self._write_snapshot(payload)
+        if os.path.exists(self.compacting_path):
+            os.remove(self.compacting_path)
+
+    def close(self) -> None:
+        """
+        Fecha o journal aberto.
+        """
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+# tabelas indexadas por ID; as demais chaves de topo vão para `settings`
+_ROW_TABLES = ("participants", "bonus_roles", "blacklist", "manual_tags")
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS participants (
+    user_id TEXT PRIMARY KEY,
+    first_name TEXT NOT NULL,
+    last_name TEXT NOT NULL,
+    tickets TEXT NOT NULL,
+    message_id INTEGER,
+    timestamp TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_participants_name
+    ON participants(first_name COLLATE NOCASE, last_name COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS bonus_roles (
+    role_id TEXT PRIMARY KEY,
+    quantity INTEGER NOT NULL,
+    abbreviation TEXT
+);
+CREATE TABLE IF NOT EXISTS blacklist (
+    user_id TEXT PRIMARY KEY,
+    reason TEXT,
+    banned_by INTEGER,
+    timestamp TEXT
+);
+CREATE TABLE IF NOT EXISTS moderators (
+    user_id TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS manual_tags (
+    user_id TEXT PRIMARY KEY,
+    quantity INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+def _row_for(table: str, key: str, value: Dict[str, Any]) -> Tuple:
+    if table == "participants":
+        return (key, value.get("first_name", ""), value.get("last_name", ""),
+                json.dumps(value.get("tickets") or {}, ensure_ascii=False),
+                value.get("message_id"), value.get("timestamp"))
+    if table == "bonus_roles":
+        return (key, int(value.get("quantity", 0)), value.get("abbreviation", ""))
+    if table == "blacklist":
+        return (key, value.get("reason"), value.get("banned_by"), value.get("timestamp"))
+    # manual_tags: valor é a quantidade
+    return (key, int(value))
+
+_UPSERT_SQL = {
+    "participants": "INSERT OR REPLACE INTO participants VALUES (?, ?, ?, ?, ?, ?)",
+    "bonus_roles": "INSERT OR REPLACE INTO bonus_roles VALUES (?, ?, ?)",
+    "blacklist": "INSERT OR REPLACE INTO blacklist VALUES (?, ?, ?, ?)",
+    "manual_tags": "INSERT OR REPLACE INTO manual_tags VALUES (?, ?)",
+}
+
+_KEY_COLUMN = {
+    "participants": "user_id",
+    "bonus_roles": "role_id",
+    "blacklist": "user_id",
+    "manual_tags": "user_id",
+}
+
+def _normalize_legacy(data: Dict[str, Any]) -> Dict[str, Any]:
+    # button_message_id antigo era um único int; hoje é lista
+    mids = data.get("button_message_id")
+    if mids is not None and not isinstance(mids, list):
+        data["button_message_id"] = [int(mids)] if mids else []
+    return data
+
+class SqliteStorage:
+    """
+    Banco SQLite (modo WAL) com uma tabela indexada por entidade.
+
+    Cada mutação vira upserts/deletes apenas das linhas afetadas, gravadas em
+    uma transação. O estado continua servido da memória; o SQLite substitui o
+    snapshot JSON como armazenamento durável.
+    """
+
+    def __init__(self, path: str, migrate_from: Optional[str] = None):
+        self.path = path
+        # arquivo JSON importado automaticamente se o SQLite estiver vazio
+        self.migrate_from = migrate_from
+        # o SQLite não acumula journal próprio para compactar
+        self.journal_records = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # NORMAL em WAL: commit sobrevive à morte do processo; fsync no checkpoint
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SQLITE_SCHEMA)
+
+    def _is_empty(self) -> bool:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+        return row is None
+
+    # os métodos _stmts_* apenas montam (sql, parâmetros, executemany?) com os
+    # valores do instante da chamada; a execução acontece em _execute()
+
+    def _stmts_rows(self, table: str, keys: Iterable[str], source: Dict[str, Any]) -> List[Tuple]:
+        stmts = []
+        for key in keys:
+            value = source.get(key)
+            if value is None:
+                stmts.append((f"DELETE FROM {table} WHERE {_KEY_COLUMN[table]} = ?", (key,), False))
+            else:
+                stmts.append((_UPSERT_SQL[table], _row_for(table, key, value), False))
+        return stmts
+
+    def _stmts_table(self, table: str, source: Dict[str, Any]) -> List[Tuple]:
+        return [
+            (f"DELETE FROM {table}", (), False),
+            (_UPSERT_SQL[table], [_row_for(table, k, v) for k, v in source.items()], True),
+        ]
+
+    def _stmts_moderators(self, moderators: List[Any]) -> List[Tuple]:
+        return [
+            ("DELETE FROM moderators", (), False),
+            ("INSERT OR IGNORE INTO moderators VALUES (?)", [(str(m),) for m in moderators or []], True),
+        ]
+
+    def _stmts_setting(self, key: str, data: Dict[str, Any]) -> List[Tuple]:
+        if key in data:
+            return [("INSERT OR REPLACE INTO settings VALUES (?, ?)",
+                     (key, json.dumps(data[key], ensure_ascii=False)), False)]
+        return [("DELETE FROM settings WHERE key = ?", (key,), False)]
+
+    def _stmts_all(self, data: Dict[str, Any]) -> List[Tuple]:
+        stmts = []
+        for table in _ROW_TABLES:
+            stmts += self._stmts_table(table, data.get(table) or {})
+        stmts += self._stmts_moderators(data.get("moderators", []))
+        stmts.append(("DELETE FROM settings", (), False))
+        for key in data:
+            if key not in _ROW_TABLES and key != "moderators":
+                stmts += self._stmts_setting(key, data)
+        stmts.append(("INSERT OR REPLACE INTO meta VALUES ('schema_version', '1')", (), False))
+        return stmts
+
+    def _execute(self, stmts: List[Tuple]) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, params, many in stmts:
+                    if many:
+                        self._conn.executemany(sql, params)
+                    else:
+                        self._conn.execute(sql, params)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _read_all(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {}
+        for key, value in self._conn.execute("SELECT key, value FROM settings"):
+            data[key] = json.loads(value)
+        data["participants"] = {
+            uid: {
+                "first_name": fn,
+                "last_name": ln,
+                "tickets": json.loads(tickets),
+                "message_id": mid,
+                "timestamp": ts
+            }
+            for uid, fn, ln, tickets, mid, ts in self._conn.execute("SELECT * FROM participants")
+        }
+        data["bonus_roles"] = {
+            rid: {"quantity": qty, "abbreviation": abbr}
+            for rid, qty, abbr in self._conn.execute("SELECT * FROM bonus_roles")
+        }
+        data["blacklist"] = {
+            uid: {"reason": reason, "banned_by": by, "timestamp": ts}
+            for uid, reason, by, ts in self._conn.execute("SELECT * FROM blacklist")
+        }
+        manual_tags = {uid: qty for uid, qty in self._conn.execute("SELECT * FROM manual_tags")}
+        if manual_tags:
+            data["manual_tags"] = manual_tags
+        data["moderators"] = [uid for (uid,) in self._conn.execute("SELECT user_id FROM moderators")]
+        return data
+
+    def import_data(self, data: Dict[str, Any]) -> None:
+        """
+        Substitui todo o conteúdo do SQLite pelo dicionário informado.
+
+        Args:
+            data: Banco no formato do database.json
+        """
+        self._execute(self._stmts_all(_normalize_legacy(dict(data))))
+
+    def load(self, default_factory: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Lê todas as tabelas, migrando do JSON na primeira execução.
+
+        Args:
+            default_factory: Função que gera o banco vazio
+
+        Returns:
+            Dict com o estado atual do banco
+        """
+        if self._is_empty():
+            if self.migrate_from and os.path.exists(self.migrate_from):
+                data = JsonStorage(self.migrate_from).load(default_factory)
+                self.import_data(data)
+                logger.info(f"Database migrado de {self.migrate_from} para {self.path}: "
+                            f"{len(data.get('participants', {}))} participante(s)")
+            else:
+                self.import_data(default_factory())
+        with self._lock:
+            return self._read_all()
+
+    def prepare(self, ops: List[Dict[str, Any]], data: Dict[str, Any]) -> List[Tuple]:
+        """
+        Monta os comandos SQL das linhas afetadas pelas operações.
+
+        Chamado com o banco travado, logo após aplicar as operações em memória.
+        Os valores são lidos de `data`, então caminhos aninhados (ex.:
+        participants/<id>/tickets) regravam só a linha do participante.
+
+        Args:
+            ops: Operações já aplicadas em memória
+            data: Banco em memória
+
+        Returns:
+            Lote a ser passado para write()
+        """
+        stmts: List[Tuple] = []
+        for op in ops:
+            path = op.get("path") or []
+            if not path:
+                stmts += self._stmts_all(data)
+                continue
+            top = path[0]
+            if top in _ROW_TABLES:
+                if len(path) == 1:
+                    stmts += self._stmts_table(top, data.get(top) or {})
+                else:
+                    stmts += self._stmts_rows(top, [path[1]], data.get(top) or {})
+            elif top == "moderators":
+                stmts += self._stmts_moderators(data.get("moderators", []))
+            else:
+                stmts += self._stmts_setting(top, data)
+        return stmts
+
+    def write(self, stmts: List[Tuple]) -> None:
+        """
+        Executa um lote em uma única transação.
+
+        Args:
+            stmts: Retorno de prepare()
+        """
+        if stmts:
+            self._execute(stmts)
+
+    def sync(self) -> None:
+        """
+        Nada a fazer: cada write() já é uma transação confirmada.
+        """
+
+    def begin_compaction(self, data: Dict[str, Any], full: bool = False) -> Optional[List[Tuple]]:
+        """
+        Prepara a compactação; só captura o banco se for preciso regravar tudo.
+
+        Args:
+            data: Cópia do banco tirada com o lock
+            full: True se o dicionário foi alterado fora das funções do módulo
+
+        Returns:
+            Comandos para regravar o banco ou None para apenas fazer checkpoint
+        """
+        return self._stmts_all(data) if full else None
+
+    def finish_compaction(self, token: Optional[List[Tuple]]) -> None:
+        """
+        Regrava o banco (se necessário) e faz checkpoint do WAL.
+
+        Args:
+            token: Retorno de begin_compaction()
+        """
+        if token:
+            self._execute(token)
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self) -> None:
+        """
+        Fecha a conexão com o SQLite.
+        """
+        with self._lock:
+            self._conn.close()
+
+def migrate_json_to_sqlite(json_path: str, sqlite_path: str) -> int:
+    """
+    Migra um database.json (snapshot + journal) para um arquivo SQLite.
+
+    Sobrescreve o conteúdo do SQLite de destino.
+
+    Args:
+        json_path: Caminho do database.json
+        sqlite_path: Caminho do arquivo SQLite
+
+    Returns:
+        Quantidade de participantes migrados
+    """
+    data = JsonStorage(json_path).load(dict)
+    target = SqliteStorage(sqlite_path)
+    try:
+        target.import_data(data)
+    finally:
+        target.close()
+    return len(data.get("participants", {}))
+
+if __name__ == "__main__":
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) != 3:
+        print("Uso: python storage.py <database.json> <database.sqlite3>")
+        sys.exit(1)
+    total = migrate_json_to_sqlite(sys.argv[1], sys.argv[2])
+    print(f"✅ {total} participante(s) migrado(s) para {sys.argv[2]}")
@@ -0,0 +1,44 @@
+import atexit
+import importlib
+import threading
+import time
+
+import pytest
+
+import database
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_BACKEND", "json")
+    monkeypatch.setenv("DATABASE_FLUSH_INTERVAL", "0.05")
+    module = importlib.reload(database)
+    module.DATABASE_FILE = str(tmp_path / "database.json")
+    module.load()
+    yield module
+    atexit.unregister(module.flush)
+    module.flush()
+    module._storage.close()
+
+
+def _wait(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_commit_between_timer_and_flush_is_synced(db):
+    release = threading.Event()
+    # segura a thread de I/O para que o timer enfileire o flush atrás dela
+    db._submit_io(release.wait)
+    db.set_hashtag("#a")
+    assert _wait(lambda: db._io_executor._work_queue.qsize() >= 2)
+    # timer já disparou, mas o flush ainda não rodou: não arma timer novo
+    db.set_hashtag("#b")
+    release.set()
+
+    assert _wait(lambda: not db._storage._pending_sync and db._flush_timer is None)
+    assert db._batches_written == db._batches_submitted
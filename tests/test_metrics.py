@@ -0,0 +1,65 @@
+import pytest
+
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    for registry in (metrics.histograms, metrics.counters, metrics.gauges):
+        registry.clear()
+    metrics._type_conflicts.clear()
+    yield
+    for registry in (metrics.histograms, metrics.counters, metrics.gauges):
+        registry.clear()
+
+
+def _type_lines(text):
+    return [line for line in text.splitlines() if line.startswith("# TYPE")]
+
+
+def test_histogram_exposition_is_cumulative():
+    hist = metrics.histogram("handler_seconds", "command:lista")
+    hist.observe(0.02)
+    hist.observe(0.3)
+    text = metrics.render_prometheus()
+
+    assert _type_lines(text) == ["# TYPE sorteio_handler_seconds histogram"]
+    assert 'sorteio_handler_seconds_bucket{handler="command:lista",le="0.025"} 1' in text
+    assert 'sorteio_handler_seconds_bucket{handler="command:lista",le="0.5"} 2' in text
+    assert 'sorteio_handler_seconds_bucket{handler="command:lista",le="+Inf"} 2' in text
+    assert 'sorteio_handler_seconds_count{handler="command:lista"} 2' in text
+
+
+def test_name_registered_with_two_types_is_exposed_once():
+    metrics.set_gauge("queue_lag_seconds", 0.5)
+    metrics.histogram("queue_lag_seconds").observe(0.5)
+    text = metrics.render_prometheus()
+
+    assert _type_lines(text) == ["# TYPE sorteio_queue_lag_seconds gauge"]
+    assert "sorteio_queue_lag_seconds_bucket" not in text
+    assert "sorteio_queue_lag_seconds 0.5" in text
+
+
+def test_extra_gauge_cannot_shadow_a_counter():
+    metrics.inc("registrations_total")
+    text = metrics.render_prometheus({("registrations_total", ""): 3})
+
+    assert _type_lines(text) == ["# TYPE sorteio_registrations_total counter"]
+    assert "sorteio_registrations_total 1" in text
+    assert "sorteio_registrations_total 3" not in text
+
+
+def test_loop_lag_monitor_uses_one_type_per_name():
+    import asyncio
+
+    async def run():
+        task = asyncio.create_task(metrics.monitor_loop_lag(interval=0.01))
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+    asyncio.run(run())
+    text = metrics.render_prometheus()
+    names = [line.split()[2] for line in _type_lines(text)]
+    assert len(names) == len(set(names))
+    assert "sorteio_event_loop_lag_seconds" in names
+    assert "sorteio_event_loop_lag_last_seconds" in names
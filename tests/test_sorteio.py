@@ -0,0 +1,31 @@
+import sorteio
+
+
+def test_entropy_formatting_variants_give_the_same_seed():
+    variants = ["01 02 03", "1-2-3", "1, 2, 3", " 1 / 02 / 003 "]
+    assert {sorteio.normalize_entropy(v) for v in variants} == {"1-2-3"}
+    seeds = {sorteio.effective_seed("s", "sha", v) for v in variants}
+    assert len(seeds) == 1
+
+
+def test_entropy_token_boundaries_are_part_of_the_value():
+    assert sorteio.normalize_entropy("010203") == "10203"
+    assert sorteio.normalize_entropy("010203") != sorteio.normalize_entropy("01 02 03")
+    assert sorteio.normalize_entropy("12 3") != sorteio.normalize_entropy("1 23")
+
+
+def test_entropy_keeps_letters_lowercased():
+    assert sorteio.normalize_entropy("Bloco 00AbC") == "bloco-00abc"
+    assert sorteio.normalize_entropy("") == ""
+
+
+def test_replay_matches_the_original_draw(tmp_path):
+    entries = sorteio.canonical_entries({"3": 1, "10": 5, "2": 2, "7": 0})
+    path = str(tmp_path / "snapshot.jsonl")
+    sha = sorteio.write_snapshot(path, entries)
+    seed = sorteio.effective_seed("segredo", sha, "05 12 33")
+
+    replay_sha, results = sorteio.replay(path, "segredo", 2, "5-12-33")
+    assert replay_sha == sha
+    assert results == sorteio.draw(entries, 2, seed)
+    assert len({r["user_id"] for r in results}) == 2
@@ -0,0 +1,46 @@
+import json
+
+from storage import JsonStorage, encode_op
+
+
+def _op(user_id):
+    return {"op": "set", "path": ["participants", user_id], "value": {"first_name": user_id}}
+
+
+def test_torn_journal_tail_is_dropped_before_appending(tmp_path):
+    path = str(tmp_path / "database.json")
+    storage = JsonStorage(path)
+    storage.load(dict)
+    storage.write([encode_op(_op("1"))])
+    storage.close()
+
+    # queda no meio da escrita da segunda operação
+    with open(storage.journal_path, 'a', encoding='utf-8') as f:
+        f.write(encode_op(_op("2"))[:-7])
+
+    storage = JsonStorage(path)
+    data = storage.load(dict)
+    assert sorted(data["participants"]) == ["1"]
+    storage.write([encode_op(_op("3"))])
+    storage.close()
+
+    data = JsonStorage(path).load(dict)
+    assert sorted(data["participants"]) == ["1", "3"]
+    with open(storage.journal_path, 'r', encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    assert [json.loads(line)["path"][1] for line in lines] == ["1", "3"]
+
+
+def test_journal_without_torn_tail_is_untouched(tmp_path):
+    path = str(tmp_path / "database.json")
+    storage = JsonStorage(path)
+    storage.load(dict)
+    storage.write([encode_op(_op("1")), encode_op(_op("2"))])
+    storage.close()
+    with open(storage.journal_path, 'rb') as f:
+        before = f.read()
+
+    data = JsonStorage(path).load(dict)
+    assert sorted(data["participants"]) == ["1", "2"]
+    with open(storage.journal_path, 'rb') as f:
+        assert f.read() == before
@@ -0,0 +1,128 @@
+import random
+import re
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("discord")
+
+import utils
+
+
+def _reference_clean_text(s):
+    if not s:
+        return ""
+    return re.sub(r'[^\w\s]', '', s).strip().casefold()
+
+
+def _reference_calculate_tickets(member, bonus_roles, tag_enabled, tag_text, tag_quantity, manual_tag=None):
+    # calculate_tickets antes do TicketRules, mantido aqui só para comparação
+    tickets = {"base": 1}
+
+    roles_dict = {}
+    try:
+        member_roles = getattr(member, "roles", []) or []
+        for r in member_roles:
+            rid = str(r.id)
+            if rid in bonus_roles:
+                entry = bonus_roles.get(rid)
+                if entry:
+                    roles_dict[rid] = {
+                        "quantity": int(entry.get("quantity", 0)),
+                        "abbreviation": entry.get("abbreviation", "")
+                    }
+    except Exception:
+        member_roles = []
+
+    if roles_dict:
+        tickets["roles"] = roles_dict
+
+    found = False
+    if tag_enabled and tag_text:
+        tag_search = tag_text.strip()
+        tag_clean = _reference_clean_text(tag_search)
+
+        checks = []
+        if hasattr(member, "display_name"):
+            checks.append(getattr(member, "display_name", "") or "")
+        if hasattr(member, "nick"):
+            checks.append(getattr(member, "nick", "") or "")
+        if hasattr(member, "global_name"):
+            checks.append(getattr(member, "global_name", "") or "")
+        checks.append(getattr(member, "name", "") or "")
+
+        for field in checks:
+            if not field:
+                continue
+            f_raw = field.strip().casefold()
+            f_clean = _reference_clean_text(field)
+            if tag_search.casefold() in f_raw or (tag_clean and tag_clean in f_clean):
+                found = True
+                break
+
+        if not found:
+            try:
+                for r in member_roles:
+                    rn = (r.name or "").strip()
+                    if not rn:
+                        continue
+                    if tag_search.casefold() == rn.casefold() or tag_search.casefold() in rn.casefold():
+                        found = True
+                        break
+            except Exception:
+                pass
+
+        if found:
+            tickets["tag"] = int(tag_quantity or 1)
+
+    if manual_tag is not None and int(manual_tag) > 0:
+        tickets["manual_tag"] = int(manual_tag)
+
+    return tickets
+
+
+FRAGMENTS = ["Ana", "ÉRIC", "joão", "[CLÃ]", "clã", "⚡CLA⚡", "CLA", "  ", "🔥", "x_y", "Ünïcode", ""]
+ROLE_IDS = list(range(1000, 1012))
+
+
+def _random_text(rng):
+    return "".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 4)))
+
+
+def _random_member(rng):
+    attrs = {"name": _random_text(rng) or "user"}
+    for attr in ("display_name", "nick", "global_name"):
+        if rng.random() < 0.8:
+            attrs[attr] = _random_text(rng) if rng.random() < 0.8 else None
+    if rng.random() < 0.9:
+        attrs["roles"] = [
+            SimpleNamespace(id=rid, name=_random_text(rng) if rng.random() < 0.9 else None)
+            for rid in rng.sample(ROLE_IDS, rng.randint(0, 5))
+        ]
+    return SimpleNamespace(**attrs)
+
+
+def _random_config(rng):
+    bonus_roles = {
+        str(rid): {"quantity": rng.randint(0, 5), "abbreviation": rng.choice(["", "VIP", "B"])}
+        for rid in rng.sample(ROLE_IDS, rng.randint(0, 6))
+    }
+    tag_text = rng.choice([None, "", "CLA", "[CLÃ]", "clã", "⚡", " cla "])
+    return bonus_roles, rng.random() < 0.8, tag_text, rng.choice([0, 1, 3])
+
+
+def test_ticket_rules_match_previous_calculate_tickets():
+    rng = random.Random(1234)
+    for _ in range(200):
+        bonus_roles, tag_enabled, tag_text, tag_quantity = _random_config(rng)
+        rules = utils.TicketRules(bonus_roles, tag_enabled, tag_text, tag_quantity)
+        for _ in range(100):
+            member = _random_member(rng)
+            manual_tag = rng.choice([None, 0, 2])
+            expected = _reference_calculate_tickets(
+                member, bonus_roles, tag_enabled, tag_text, tag_quantity, manual_tag
+            )
+            assert rules.compute(member, manual_tag) == expected
+            assert utils.calculate_tickets(
+                member, bonus_roles, tag_enabled, tag_text, tag_quantity, manual_tag
+            ) == expected
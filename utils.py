@@ -1,12 +1,106 @@
+import csv
+import gzip
+import io
+import json
 import re
+import tempfile
 import discord
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+_CLEAN_RE = re.compile(r'[^\w\s]')
 
 def _clean_text(s: Optional[str]) -> str:
     if not s:
         return ""
     # remove emojis/caracteres especiais mantendo letras/números/espacos
-    return re.sub(r'[^\w\s]', '', s).strip().casefold()
+    return _CLEAN_RE.sub('', s).strip().casefold()
+
+class TicketRules:
+    """
+    Regras de fichas pré-processadas a partir de bonus_roles + configuração da TAG.
+    Monte uma vez (ex.: por lote do /atualizar) e chame compute(member) para cada membro:
+      - cargos ficam num dict indexado pelo ID inteiro (sem str(r.id) por cargo do membro)
+      - o texto da TAG já fica normalizado (casefold e versão sem emoji/caracteres especiais)
+    """
+
+    def __init__(
+        self,
+        bonus_roles: Dict[str, Any],
+        tag_enabled: bool,
+        tag_text: Optional[str],
+        tag_quantity: int
+    ):
+        # role_id (int) -> (role_id str, quantity, abbreviation)
+        self.roles: Dict[int, Tuple[str, int, str]] = {}
+        for rid, entry in (bonus_roles or {}).items():
+            if not entry:
+                continue
+            try:
+                self.roles[int(rid)] = (str(rid), int(entry.get("quantity", 0)), entry.get("abbreviation", ""))
+            except (TypeError, ValueError):
+                continue
+
+        self.tag_active = bool(tag_enabled and tag_text)
+        self.tag_quantity = int(tag_quantity or 1)
+        self.tag_search = tag_text.strip().casefold() if self.tag_active else ""
+        self.tag_clean = _clean_text(tag_text.strip()) if self.tag_active else ""
+
+    @classmethod
+    def from_config(cls, bonus_roles: Dict[str, Any], tag_config: Dict[str, Any]) -> "TicketRules":
+        return cls(bonus_roles, tag_config.get("enabled"), tag_config.get("text"), tag_config.get("quantity"))
+
+    def _has_tag(self, member: discord.abc.User, member_roles: List[Any]) -> bool:
+        # 1) checa nomes (display_name, nick, global_name, name)
+        tag_search = self.tag_search
+        tag_clean = self.tag_clean
+        for attr in ("display_name", "nick", "global_name", "name"):
+            field = getattr(member, attr, None)
+            if not field:
+                continue
+            if tag_search in field.strip().casefold():
+                return True
+            if tag_clean and tag_clean in _clean_text(field):
+                return True
+
+        # 2) se não achou nos nomes, checa roles (role.name), substring case-insensitive
+        try:
+            for r in member_roles:
+                rn = (r.name or "").strip()
+                if rn and tag_search in rn.casefold():
+                    return True
+        except Exception:
+            pass
+        return False
+
+    def compute(self, member: discord.abc.User, manual_tag: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Calcula o dicionário de 'tickets' de um membro (mesmo formato de calculate_tickets).
+        """
+        tickets: Dict[str, Any] = {"base": 1}
+
+        roles_dict: Dict[str, Dict[str, Any]] = {}
+        try:
+            member_roles = getattr(member, "roles", []) or []
+            roles = self.roles
+            for r in member_roles:
+                rule = roles.get(r.id)
+                if rule:
+                    roles_dict[rule[0]] = {"quantity": rule[1], "abbreviation": rule[2]}
+        except Exception:
+            # membro pode ser discord.User (sem roles) — ignora roles
+            member_roles = []
+
+        if roles_dict:
+            tickets["roles"] = roles_dict
+
+        if self.tag_active and self._has_tag(member, member_roles):
+            tickets["tag"] = self.tag_quantity
+
+        # Mescla manual_tag se fornecido (útil ao recalcular mantendo o valor manual do DB)
+        if manual_tag is not None and int(manual_tag) > 0:
+            tickets["manual_tag"] = int(manual_tag)
+
+        return tickets
 
 def calculate_tickets(
     member: discord.abc.User,
@@ -21,77 +115,9 @@ def calculate_tickets(
     - bonus_roles: dict do DB com keys = role_id (str) -> {quantity, abbreviation}
     - Detecta TAGs tanto em nomes (nick/display/global/name) quanto em roles (role.name).
     - Se manual_tag for fornecido, ele será incluído em tickets['manual_tag'] (útil ao recalcular).
+    Para muitos membros com as mesmas regras, prefira montar um TicketRules uma vez.
     """
-    tickets: Dict[str, Any] = {}
-    tickets["base"] = 1
-
-    # roles -> armazena por id string com quantity e abbreviation
-    roles_dict: Dict[str, Dict[str, Any]] = {}
-    try:
-        member_roles = getattr(member, "roles", []) or []
-        for r in member_roles:
-            rid = str(r.id)
-            if str(r.id) in bonus_roles or rid in bonus_roles:
-                entry = bonus_roles.get(rid) or bonus_roles.get(str(r.id))
-                if entry:
-                    roles_dict[rid] = {
-                        "quantity": int(entry.get("quantity", 0)),
-                        "abbreviation": entry.get("abbreviation", "")
-                    }
-    except Exception:
-        # membro pode ser discord.User (sem roles) — ignora roles
-        member_roles = []
-
-    if roles_dict:
-        tickets["roles"] = roles_dict
-
-    # Detecção da TAG automática em vários campos do membro
-    found = False
-    if tag_enabled and tag_text:
-        tag_search = tag_text.strip()
-        tag_clean = _clean_text(tag_search)
-
-        # 1) checa nomes (display_name, nick, global_name, name)
-        checks = []
-        if hasattr(member, "display_name"):
-            checks.append(getattr(member, "display_name", "") or "")
-        if hasattr(member, "nick"):
-            checks.append(getattr(member, "nick", "") or "")
-        if hasattr(member, "global_name"):
-            checks.append(getattr(member, "global_name", "") or "")
-        checks.append(getattr(member, "name", "") or "")
-
-        for field in checks:
-            if not field:
-                continue
-            f_raw = field.strip().casefold()
-            f_clean = _clean_text(field)
-            if tag_search.casefold() in f_raw or (tag_clean and tag_clean in f_clean):
-                found = True
-                break
-
-        # 2) se não achou nos nomes, checa roles (role.name)
-        if not found:
-            try:
-                for r in member_roles:
-                    rn = (r.name or "").strip()
-                    if not rn:
-                        continue
-                    # compara exatidão ou substring, case-insensitive
-                    if tag_search.casefold() == rn.casefold() or tag_search.casefold() in rn.casefold():
-                        found = True
-                        break
-            except Exception:
-                pass
-
-        if found:
-            tickets["tag"] = int(tag_quantity or 1)
-
-    # Mescla manual_tag se fornecido (útil ao recalcular mantendo o valor manual do DB)
-    if manual_tag is not None and int(manual_tag) > 0:
-        tickets["manual_tag"] = int(manual_tag)
-
-    return tickets
+    return TicketRules(bonus_roles, tag_enabled, tag_text, tag_quantity).compute(member, manual_tag)
 
 def get_total_tickets(tickets: Optional[Dict[str, Any]]) -> int:
     if not tickets:
@@ -187,6 +213,107 @@ def format_detailed_entry(first_name: str, last_name: str, tickets: Dict[str, An
 
     return lines
 
+# exportações até este tamanho ficam em memória; acima disso vão para um arquivo temporário do sistema
+EXPORT_SPOOL_SIZE = 8 * 1024 * 1024
+
+# extensão do arquivo gerado por cada tipo do /exportar
+EXPORT_EXTENSIONS = {
+    "simples": "txt",
+    "com_fichas": "txt",
+    "contagem": "txt",
+    "csv": "csv",
+    "jsonl": "jsonl",
+}
+
+EXPORT_CSV_FIELDS = ["user_id", "first_name", "last_name", "base", "cargos", "tag", "tag_manual", "total"]
+
+def ticket_breakdown(tickets: Optional[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Fichas por origem (base, cargos, tag, tag_manual) e total, como em get_total_tickets.
+    """
+    tickets = tickets or {}
+    roles = 0
+    for role_info in tickets.get("roles", {}).values():
+        try:
+            roles += int(role_info.get("quantity", 0))
+        except Exception:
+            pass
+    return {
+        "base": int(tickets.get("base", 1)),
+        "cargos": roles,
+        "tag": int(tickets.get("tag", 0)),
+        "tag_manual": int(tickets.get("manual_tag", 0)),
+        "total": get_total_tickets(tickets)
+    }
+
+def _iter_csv_rows(participants: Iterable[Tuple[str, Dict[str, Any]]]) -> Iterator[str]:
+    line = io.StringIO()
+    writer = csv.writer(line, lineterminator="")
+    writer.writerow(EXPORT_CSV_FIELDS)
+    yield line.getvalue()
+    for user_id, data in participants:
+        line.seek(0)
+        line.truncate()
+        counts = ticket_breakdown(data.get("tickets"))
+        writer.writerow([user_id, data["first_name"], data["last_name"],
+                         counts["base"], counts["cargos"], counts["tag"],
+                         counts["tag_manual"], counts["total"]])
+        yield line.getvalue()
+
+def _iter_jsonl_rows(participants: Iterable[Tuple[str, Dict[str, Any]]]) -> Iterator[str]:
+    for user_id, data in participants:
+        tickets = data.get("tickets") or {}
+        row = {"user_id": user_id, "first_name": data["first_name"], "last_name": data["last_name"]}
+        row.update(ticket_breakdown(tickets))
+        row["roles"] = {
+            rid: {"quantity": info.get("quantity", 0), "abbreviation": info.get("abbreviation", "")}
+            for rid, info in tickets.get("roles", {}).items()
+        }
+        yield json.dumps(row, ensure_ascii=False, separators=(",", ":"))
+
+def iter_export_lines(participants: Iterable[Tuple[str, Dict[str, Any]]], tipo: str) -> Iterator[str]:
+    """
+    Gera as linhas do /exportar uma a uma, sem montar o texto inteiro.
+    `participants` são pares (user_id, dados) (ex.: list(participants.items())).
+    
+    Tipos:
+      simples    - nomes numerados em ordem alfabética
+      com_fichas - uma linha por ficha (formato de format_detailed_entry)
+      contagem   - uma linha por participante com o total de fichas
+      csv/jsonl  - uma linha por participante com fichas por origem e total
+    """
+    if tipo == "simples":
+        yield "📋 Lista de Participantes (Simples)\n"
+        names = sorted((f"{data['first_name']} {data['last_name']}" for _, data in participants),
+                       key=str.lower)
+        for i, name in enumerate(names, 1):
+            yield f"{i}. {name}"
+    elif tipo == "contagem":
+        yield "📋 Lista de Participantes (Contagem de Fichas)\n"
+        for _, data in participants:
+            yield f"{data['first_name']} {data['last_name']} — {get_total_tickets(data.get('tickets'))}"
+    elif tipo == "csv":
+        yield from _iter_csv_rows(participants)
+    elif tipo == "jsonl":
+        yield from _iter_jsonl_rows(participants)
+    else:
+        yield "📋 Lista de Participantes (Com Fichas)\n"
+        for _, data in participants:
+            yield from format_detailed_entry(data["first_name"], data["last_name"], data["tickets"])
+
+def write_export(lines: Iterable[str], compress: bool = False) -> tempfile.SpooledTemporaryFile:
+    """
+    Grava as linhas num buffer (memória, ou disco temporário se ficar grande),
+    opcionalmente com gzip, e devolve o buffer posicionado no início.
+    """
+    buf = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
+    out = gzip.GzipFile(fileobj=buf, mode="wb", mtime=0) if compress else buf
+    out.writelines(line.encode("utf-8") + b"\n" for line in lines)
+    if compress:
+        out.close()
+    buf.seek(0)
+    return buf
+
 def validate_full_name(first_name: str, last_name: str) -> tuple:
     """
     Valida primeiro e último nome inseridos no modal.